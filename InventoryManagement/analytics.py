@@ -0,0 +1,163 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from util.instrumentation import instrumented, measure
+from util.lazy_pandas import load_pandas
+from util.stock_ledger import StockLedger
+
+# Reporting periods for sales, as pandas period frequencies.
+PERIODS = {'day': 'D', 'week': 'W', 'month': 'M'}
+
+
+class InventoryAnalytics(object):
+    """
+    Inventory and sales reports over products.csv and the order journal, computed with whole-column
+    operations. Results are cached until the data version (products.csv and journal size and mtime)
+    changes, and journal lines are parsed incrementally: only orders appended since the last report are read.
+    """
+
+    def __init__(self, data_dir: str = 'data') -> None:
+        """
+        The __init__ method for InventoryAnalytics.
+        :param data_dir: The path to the directory containing products.csv and orders.jsonl.
+        """
+        self.data_dir = Path(data_dir)
+        self.products_file = self.data_dir / 'products.csv'
+        self.journal_file = self.data_dir / 'orders.jsonl'
+        self._cache: Dict[str, object] = {}  # Reports by period and the frames behind them.
+        self._cache_version = None
+        self._journal_offset = 0  # Bytes of the journal already parsed into _sales.
+        self._sales: Dict[str, List] = {'timestamp': [], 'product_id': [], 'quantity': [], 'price_cents': []}
+
+    def data_version(self) -> Tuple:
+        """
+        Identify the current state of the data the reports are computed from.
+        :return: A tuple that changes whenever products.csv or the order journal changes.
+        """
+        version = []
+        for path in (self.products_file, self.journal_file):
+            try:
+                stat = path.stat()
+                version.extend([stat.st_size, stat.st_mtime_ns])
+            except FileNotFoundError:
+                version.extend([None, None])
+        return tuple(version)
+
+    @instrumented('InventoryAnalytics.reports')
+    def reports(self, period: str = 'month') -> Dict:
+        """
+        Compute every report, or return the cached reports if the data has not changed.
+        :param period: The sales period, one of 'day', 'week' or 'month'.
+        :return: A dict with 'valuation' (a dict), and 'stock_by_category', 'sales_by_product' and
+                 'sales_by_period' (DataFrames). Money is in dollars.
+        """
+        if period not in PERIODS:
+            raise ValueError(f"Argument 'period' must be one of {', '.join(PERIODS)}.")
+        version = self.data_version()
+        if version != self._cache_version:
+            self._cache = {}
+            self._cache_version = version
+        if period not in self._cache:
+            if 'frames' not in self._cache:
+                self._cache['frames'] = (self._products(), self._sales_frame())
+            products, sales = self._cache['frames']
+            self._cache[period] = {
+                'valuation': self._valuation(products),
+                'stock_by_category': self._stock_by_category(products),
+                'sales_by_product': self._sales_by_product(products, sales),
+                'sales_by_period': self._sales_by_period(sales, PERIODS[period]),
+            }
+        return self._cache[period]
+
+    def _products(self):
+        """Products with integer-cent retail and member unit prices, priced like carts are."""
+        import numpy as np
+        from util.pricing import PriceBook  # Imported here so that start-up does not load numpy.
+
+        df = StockLedger.open(self.products_file).load()
+        df.columns = [col.strip() for col in df.columns]
+        book = PriceBook.from_dataframe(df)
+        ids = df['product_id'].to_numpy()
+        priced = book.priced(ids)  # Products without a price count at zero value.
+        retail_cents, member_cents = np.zeros(len(ids), dtype=np.int64), np.zeros(len(ids), dtype=np.int64)
+        retail_cents[priced] = book.unit_prices(ids[priced], False)
+        member_cents[priced] = book.unit_prices(ids[priced], True)
+        return df.assign(
+            retail_cents=retail_cents,
+            member_cents=member_cents,
+            product_category=df['product_category'].astype(str).str.strip(),
+            product_sub_category=df['product_sub_category'].astype(str).str.strip())
+
+    @staticmethod
+    def _valuation(products) -> Dict:
+        quantity = products['product_quantity'].to_numpy()
+        return {'products': len(products), 'units': int(quantity.sum()),
+                'retail_value': int((quantity * products['retail_cents'].to_numpy()).sum()) / 100,
+                'member_value': int((quantity * products['member_cents'].to_numpy()).sum()) / 100}
+
+    @staticmethod
+    def _stock_by_category(products):
+        grouped = products.assign(
+            retail_value=products['product_quantity'] * products['retail_cents'],
+            member_value=products['product_quantity'] * products['member_cents'],
+        ).groupby(['product_category', 'product_sub_category'], sort=True).agg(
+            products=('product_id', 'size'), units=('product_quantity', 'sum'),
+            retail_value=('retail_value', 'sum'), member_value=('member_value', 'sum'))
+        grouped[['retail_value', 'member_value']] = grouped[['retail_value', 'member_value']] / 100
+        return grouped.rename_axis(['category', 'sub_category']).reset_index()
+
+    @staticmethod
+    def _sales_by_product(products, sales):
+        totals = sales.groupby('product_id').agg(units=('quantity', 'sum'), revenue=('revenue_cents', 'sum'))
+        names = products.set_index('product_id')['product_name'].astype(str).str.strip()
+        totals = totals.join(names.rename('name'), how='left')
+        totals['revenue'] = totals['revenue'] / 100
+        return totals.sort_values('revenue', ascending=False).reset_index()[
+            ['product_id', 'name', 'units', 'revenue']]
+
+    @staticmethod
+    def _sales_by_period(sales, freq: str):
+        pd = load_pandas()
+        periods = pd.to_datetime(sales['timestamp'], unit='s').dt.to_period(freq).rename('period')
+        totals = sales.groupby(periods).agg(units=('quantity', 'sum'), revenue=('revenue_cents', 'sum'))
+        totals['revenue'] = totals['revenue'] / 100
+        return totals.reset_index()
+
+    def _sales_frame(self):
+        """One row per journalled order line, reading only the part of the journal not seen before."""
+        pd = load_pandas()
+        with measure('InventoryAnalytics.read_journal'):
+            self._read_new_orders()
+        sales = pd.DataFrame({
+            'timestamp': pd.Series(self._sales['timestamp'], dtype='float64'),
+            'product_id': pd.Series(self._sales['product_id'], dtype='int64'),
+            'quantity': pd.Series(self._sales['quantity'], dtype='int64'),
+            'price_cents': pd.Series(self._sales['price_cents'], dtype='int64')})
+        return sales.assign(revenue_cents=sales['quantity'] * sales['price_cents'])
+
+    def _read_new_orders(self) -> None:
+        try:
+            size = os.path.getsize(self.journal_file)
+        except FileNotFoundError:
+            size = 0
+        if size < self._journal_offset:
+            # The journal was replaced, start over.
+            self._journal_offset = 0
+            for values in self._sales.values():
+                values.clear()
+        if size == self._journal_offset:
+            return
+        with open(self.journal_file, mode='rb') as file:
+            file.seek(self._journal_offset)
+            data = file.read(size - self._journal_offset)
+        complete = data.rfind(b'\n') + 1  # Leave a torn or still-being-written last line for next time.
+        for line in data[:complete].splitlines():
+            record = json.loads(line)
+            for order_line in record['lines']:
+                self._sales['timestamp'].append(record['timestamp'])
+                self._sales['product_id'].append(order_line['product_id'])
+                self._sales['quantity'].append(order_line['quantity'])
+                self._sales['price_cents'].append(round(order_line['price'] * 100))
+        self._journal_offset += complete
@@ -1,20 +1,35 @@
-import pandas as pd
+import math
 from pathlib import Path
 
+from util.catalog_snapshot import read_products, write_products
+from util.instrumentation import instrumented, record_file_read, record_file_write
+from util.expiry_index import ExpiryIndex
+from util.restock_monitor import RestockMonitor
+from util.stock_ledger import StockLedger
+from util.lazy_pandas import load_pandas
+
 class ProductManager:
-    def __init__(self):
-        self.data_dir = Path("data")
+    def __init__(self, data_dir="data"):
+        self.data_dir = Path(data_dir)
         self.categories_file = self.data_dir / "categories.csv"
         self.subcategories_file = self.data_dir / "subcategories.csv"
         self.products_file = self.data_dir / "products.csv"
+        self._expiry_index = None
+        self._restock_monitor = None
+        self._names = {}  # product_id -> product_name, kept with the indexes so reports need not read products.csv.
+        self._quantities = {}  # product_id -> product_quantity in products.csv, for products with a usable one.
+        self._applied = {}  # Journalled sales (StockLedger decrements) already applied to the restock monitor.
+        self._indexed_version = None  # Size and mtime of the products.csv the indexes reflect.
 
         self.initialize_files()
+        self.stock = StockLedger.open(self.products_file)
 
     def initialize_files(self):
         self.data_dir.mkdir(exist_ok=True)
 
         
         if not self.products_file.exists():
+            pd = load_pandas()
             pd.DataFrame(columns=["product_id", "product_name", "product_brand", 
                                   "product_description", "product_price", 
                                   "product_member_price", "product_quantity", 
@@ -23,9 +38,11 @@ class ProductManager:
                                   "product_storage_instructions", "product_allergens"]).to_csv(self.products_file, index=False)
 
         if not self.categories_file.exists():
+            pd = load_pandas()
             pd.DataFrame(columns=["category_id", "category_name"]).to_csv(self.categories_file, index=False)
 
         if not self.subcategories_file.exists():
+            pd = load_pandas()
             pd.DataFrame(columns=["subcategory_id", "subcategory_name"]).to_csv(self.subcategories_file, index=False)
     
     def user_interface(self):
@@ -37,7 +54,9 @@ class ProductManager:
             print("4. Display Products")
             print("5. Update Product")
             print("6. Delete Product")
-            print("7. Exit")
+            print("7. Expiry Report")
+            print("8. Low Stock Report")
+            print("9. Exit")
             choice = input("Choose an action: ")
             if choice == '1':
                 category_name = input("Enter new Category Name (or X to cancel): ")
@@ -56,28 +75,40 @@ class ProductManager:
             elif choice == '6':
                 self.delete_product()
             elif choice == '7':
+                self.expiry_report_ui()
+            elif choice == '8':
+                self.low_stock_report_ui()
+            elif choice == '9':
                 break
             else:
                 print("Invalid choice. Please try again.")
 
+    @instrumented('ProductManager.add_category')
     def add_category(self, category_name):
+        pd = load_pandas()
         df = pd.read_csv(self.categories_file)
+        record_file_read('ProductManager.add_category', self.categories_file)
         if category_name in df['category_name'].values:
             print('Category already exists!!')
             return
         new_row = pd.DataFrame({'category_id': [df['category_id'].max() + 1 if not df.empty else 1], 'category_name': [category_name]})
         df = pd.concat([df, new_row], ignore_index=True)
         df.to_csv(self.categories_file, index=False)
+        record_file_write('ProductManager.add_category', self.categories_file)
         print(f"Successfully added category: {category_name}")
 
+    @instrumented('ProductManager.add_subcategory')
     def add_subcategory(self, subcategory_name):
+        pd = load_pandas()
         df = pd.read_csv(self.subcategories_file)
+        record_file_read('ProductManager.add_subcategory', self.subcategories_file)
         if subcategory_name in df['subcategory_name'].values:
             print('Sub-Category already exists!!')
             return
         new_row = pd.DataFrame({'subcategory_id': [df['subcategory_id'].max() + 1 if not df.empty else 1], 'subcategory_name': [subcategory_name]})
         df = pd.concat([df, new_row], ignore_index=True)
         df.to_csv(self.subcategories_file, index=False)
+        record_file_write('ProductManager.add_subcategory', self.subcategories_file)
         print(f"Successfully added sub-category: {subcategory_name}")
 
     def add_product_ui(self):
@@ -130,19 +161,24 @@ class ProductManager:
         self.add_product(product_info)
 
 
+    @instrumented('ProductManager.add_product')
     def add_product(self, product_info):
-        df = pd.read_csv(self.products_file)
-        if product_info['product_name'] in df['product_name'].values:
-            print('Product already exists!')
-            return
-        product_info['product_id'] = df['product_id'].max() + 1 if not df.empty else 1
-        new_row = pd.DataFrame([product_info])
-        df = pd.concat([df, new_row], ignore_index=True)
-        df.to_csv(self.products_file, index=False)
+        with self.stock.editing() as sold:
+            df = read_products(self.products_file)
+            if product_info['product_name'] in df['product_name'].values:
+                print('Product already exists!')
+                return
+            product_info['product_id'] = df['product_id'].max() + 1 if not df.empty else 1
+            pd = load_pandas()
+            new_row = pd.DataFrame([product_info])
+            df = pd.concat([df, new_row], ignore_index=True)
+            write_products(df, self.products_file)
+            self._update_indexes(df, product_info['product_id'], sold)
         print(f"Successfully added product: {product_info['product_name']}")
 
+    @instrumented('ProductManager.display_products')
     def display_products(self):
-        df = pd.read_csv(self.products_file)
+        df = self.stock.load()
         if df.empty:
             print('No products available.')
             return
@@ -167,7 +203,7 @@ class ProductManager:
         self.display_products()
         product_id = input('Enter the Product ID you want to update (or X to cancel): ')
         if product_id.lower() == 'x': return
-        df = pd.read_csv(self.products_file)
+        df = read_products(self.products_file)
         product_id = int(product_id)
         if not product_id in df['product_id'].values:
             print('Product ID does not exist.')
@@ -184,21 +220,154 @@ class ProductManager:
         new_value = input(f'Enter new value for {field_name} (or X to cancel): ')
         if new_value.lower() == 'x': return
         
-        df.loc[df['product_id'] == product_id, field_name] = new_value
-        df.to_csv(self.products_file, index=False)
+        try:
+            self.set_product_field(product_id, field_name, new_value)
+        except ValueError as e:
+            print(f'Error: {e}')
+            return
         print(f"Product with ID {product_id} has been updated.")
 
+    @instrumented('ProductManager.update_product')
+    def set_product_field(self, product_id, field_name, new_value):
+        with self.stock.editing() as sold:
+            df = read_products(self.products_file)
+            if field_name in df.columns:
+                new_value = self._parse_value(df[field_name], new_value)
+            df.loc[df['product_id'] == product_id, field_name] = new_value
+            write_products(df, self.products_file)
+            self._update_indexes(df, product_id, sold)
+
+    @staticmethod
+    def _parse_value(column, value):
+        # Values typed in the UI arrive as text; numeric columns only take numbers they can hold.
+        if column.dtype.kind not in 'iuf':
+            return value
+        text = str(value).strip()
+        try:
+            if column.dtype.kind in 'iu':
+                return int(text)
+            number = float(text) if text else float('nan')  # A blank float field is left empty.
+        except ValueError:
+            kind = 'a whole number' if column.dtype.kind in 'iu' else 'a number'
+            raise ValueError(f'{column.name} must be {kind}, not {value!r}.') from None
+        if math.isinf(number):
+            raise ValueError(f'{column.name} must be a number, not {value!r}.')
+        return number
+
     def delete_product(self):
         self.display_products()
         product_id = input('Enter the Product ID you want to delete (or X to cancel): ')
         if product_id.lower() == 'x': return
-        df = pd.read_csv(self.products_file)
+        df = read_products(self.products_file)
         product_id = int(product_id)
         if not product_id in df['product_id'].values:
             print('Product ID does not exist.')
             return
-        df = df[df['product_id'] != product_id]
-        df.to_csv(self.products_file, index=False)
+        self.remove_product(product_id)
         print(f'Product with ID {product_id} has been deleted.')
 
+    @instrumented('ProductManager.delete_product')
+    def remove_product(self, product_id):
+        with self.stock.editing() as sold:
+            df = read_products(self.products_file)
+            df = df[df['product_id'] != product_id]
+            write_products(df, self.products_file)
+            self._update_indexes(df, product_id, sold)
+
+    @property
+    def expiry_index(self):
+        self._refresh_indexes()
+        return self._expiry_index
+
+    @property
+    def restock_monitor(self):
+        self._refresh_indexes()
+        return self._restock_monitor
+
+    def _refresh_indexes(self):
+        # The expiry index and names only change with products.csv, so they are rebuilt only when someone else
+        # rewrote it; our own edits update them in place. Sales journalled since products.csv was compacted only
+        # move stock, which is applied to the restock monitor without reading products.csv.
+        with self.stock.reading() as decrements:
+            stat = self.products_file.stat()
+            version = (stat.st_size, stat.st_mtime_ns)
+            if self._expiry_index is None or self._indexed_version != version:
+                df = read_products(self.products_file)
+                self._expiry_index = ExpiryIndex.from_dataframe(df)
+                self._restock_monitor = RestockMonitor.from_dataframe(df)
+                self._names = dict(zip(df['product_id'].tolist(), df['product_name'].tolist()))
+                quantity = load_pandas().to_numeric(df['product_quantity'], errors='coerce')
+                usable = quantity.notna()
+                self._quantities = dict(zip(df.loc[usable, 'product_id'].astype('int64').tolist(),
+                                            quantity[usable].astype('int64').tolist()))
+                self._applied = {}
+                self._indexed_version = version
+        for product_id in decrements.keys() | self._applied.keys():
+            sold = decrements.get(product_id, 0)
+            if sold != self._applied.get(product_id, 0) and product_id in self._quantities:
+                self._restock_monitor.update(product_id, self._quantities[product_id] - sold)
+        self._applied = decrements
+
+    def _update_indexes(self, df, product_id, sold):
+        # Called while editing(), after df was written. editing() first folded the sales in sold into
+        # products.csv, which moves the quantities the restock monitor's journalled sales are counted from.
+        if self._expiry_index is None:
+            return  # Built lazily on first use.
+        for sold_id, quantity in sold.items():
+            if sold_id in self._quantities:
+                self._quantities[sold_id] -= quantity
+            self._applied[sold_id] = self._applied.get(sold_id, 0) - quantity
+        rows = df[df['product_id'] == product_id]
+        if rows.empty:
+            self._names.pop(product_id, None)
+        else:
+            self._names[product_id] = rows['product_name'].iloc[0]
+        if rows.empty or 'product_expiry' not in rows.columns:
+            self._expiry_index.remove(product_id)
+        else:
+            self._expiry_index.set(product_id, rows['product_expiry'].iloc[0])
+        self._applied.pop(product_id, None)  # Nothing of it is left unfolded.
+        try:
+            row = rows.iloc[0]
+            self._quantities[product_id] = int(float(row['product_quantity']))
+            self._restock_monitor.update(product_id, self._quantities[product_id], row.get('product_reorder_point'))
+        except (IndexError, TypeError, ValueError):
+            self._quantities.pop(product_id, None)
+            self._restock_monitor.remove(product_id)  # Deleted, or no usable quantity.
+        stat = self.products_file.stat()
+        self._indexed_version = (stat.st_size, stat.st_mtime_ns)
+
+    def expiry_report(self, days=7, today=None):
+        report = self.expiry_index.report(days, today)
+        return {action: [(expiry, product_id, self._names.get(product_id, '')) for expiry, product_id in entries]
+                for action, entries in report.items()}
+
+    def expiry_report_ui(self):
+        days = input('Show products expiring within how many days? (default 7): ').strip()
+        report = self.expiry_report(int(days) if days.isdigit() else 7)
+        print("\nExpired - remove from sale:\n-------------------")
+        for expiry, product_id, name in report['remove']:
+            print(f"ID: {product_id} - {name.strip()} - expired {expiry:%d-%m-%Y}")
+        if not report['remove']:
+            print('None')
+        print("\nExpiring soon - mark down:\n-------------------")
+        for expiry, product_id, name in report['markdown']:
+            print(f"ID: {product_id} - {name.strip()} - expires {expiry:%d-%m-%Y}")
+        if not report['markdown']:
+            print('None')
+
+    def low_stock_report(self, n=None):
+        entries = self.restock_monitor.lowest(n) if n else self.restock_monitor.below_threshold()
+        return [(product_id, self._names.get(product_id, ''), quantity, reorder_point)
+                for product_id, quantity, reorder_point in entries]
+
+    def low_stock_report_ui(self):
+        n = input('Show the N lowest-stock products, or press Enter for all at or below their reorder point: ').strip()
+        report = self.low_stock_report(int(n) if n.isdigit() else None)
+        print("\nLow stock:\n-------------------")
+        for product_id, name, quantity, reorder_point in report:
+            print(f"ID: {product_id} - {name.strip()} - {quantity} left (reorder point {reorder_point})")
+        if not report:
+            print('None')
+
 
@@ -1,5 +1,12 @@
 import os
-import pandas as pd
+import uuid
+
+from util.fund_ledger import FundLedger, InsufficientFundsError
+from util.instrumentation import instrumented, measure
+from util.lazy_pandas import load_pandas
+from util.order_journal import OrderJournal
+from util.restock_monitor import RestockMonitor
+from util.stock_ledger import OutOfStockError, StockLedger
 
 class Product:
     """
@@ -12,14 +19,16 @@ class Product:
         description (str): A description of the product.
         price (float): The price of the product.
         quantity (int): The available quantity of the product.
+        member_price (float): The price of the product for members, if any.
     """
-    def __init__(self, id, name, brand, description, price, quantity):
+    def __init__(self, id, name, brand, description, price, quantity, member_price=None):
         self.id = id
         self.name = name
         self.brand = brand
         self.description = description
         self.price = price
         self.quantity = quantity
+        self.member_price = member_price
 
 class Cart:
     """
@@ -27,11 +36,13 @@ class Cart:
 
     Attributes:
         store (Store): A reference to the store from which the cart can manipulate products.
+        customer (Customer): The customer the cart belongs to, if known.
         items (list): A list of tuples where each tuple contains a Product object and a quantity.
     """
-    def __init__(self, store):
+    def __init__(self, store, customer=None):
         self.items = []  # List to hold items in the cart.
         self.store = store  # Reference to the store for inventory management.
+        self.customer = customer  # Owner of the cart, recorded with each order.
 
     def add_product(self, product, quantity):
         """
@@ -55,11 +66,38 @@ class Cart:
             except ValueError:
                 print("Invalid input. Please enter a valid integer for the quantity.")
 
+        try:
+            self.reserve(product, quantity)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        print(f"\nAdded {quantity} of {product.name} to the cart.")
+
+    def reserve(self, product, quantity):
+        """
+        Takes the given quantity out of the store's stock and puts it in the cart, without any prompts.
+        The caller is responsible for checking that enough stock is available.
+
+        Parameters:
+            product (Product): The product to add to the cart.
+            quantity (int): The quantity of the product to add.
+
+        Raises:
+            ValueError: If the product has no price. The cart and stock are left unchanged.
+        """
+        self.store.price_book.unit_prices([product.id], False)  # Refuse products that cannot be priced.
         product.quantity -= quantity  # Decrement the stock.
-        self.store.products_df.loc[
-            self.store.products_df['product_id'] == product.id, 'product_quantity'] = product.quantity
+        self.store.set_quantity(product)
         self.items.append((product, quantity))  # Add the product to the cart.
-        print(f"\nAdded {quantity} of {product.name} to the cart.")
+
+    def clear(self):
+        """
+        Empties the cart and returns the reserved quantities to the store's stock.
+        """
+        for product, quantity in self.items:
+            product.quantity += quantity
+            self.store.set_quantity(product)
+        self.items = []
 
     def view_cart(self):
         """
@@ -69,23 +107,32 @@ class Cart:
             print("Your cart is empty.")
             return
 
-        product_info = {}
-        for product, quantity in self.items:
-            if product.name in product_info:
-                product_info[product.name]['quantity'] += quantity
-                product_info[product.name]['total_price'] += product.price * quantity
-            else:
-                product_info[product.name] = {
-                    'quantity': quantity,
-                    'total_price': product.price * quantity
-                }
-        total = sum(product.price * quantity for product, quantity in self.items)
+        quote = self.quote()
         print("\nCart Contents:")
-        for product_name, info in product_info.items():
+        for line in quote['lines']:
             print(
-                f"{info['quantity']} x {product_name} at ${info['total_price'] / info['quantity']:.2f} each (Total: ${info['total_price']:.2f})")
-        print(f"Total due: ${total:.2f}")
+                f"{line['quantity']} x {line['product'].name} at ${line['unit_cents'] / 100:.2f} each (Total: ${line['total_cents'] / 100:.2f})")
+        if self.is_member:
+            print("Member prices applied.")
+        print(f"Total due: ${quote['total_cents'] / 100:.2f}")
+
+    @property
+    def is_member(self):
+        """
+        bool: Whether the cart's customer pays member prices.
+        """
+        return self.customer is not None and self.customer.is_member
 
+    def quote(self):
+        """
+        Prices the cart with the store's price book, applying member prices for members.
+
+        Returns:
+            dict: 'lines' with product, quantity, unit_cents and total_cents per product, and 'total_cents'.
+        """
+        return self.store.price_book.quote(self.items, member=self.is_member)
+
+    @instrumented('Cart.checkout')
     def checkout(self):
         """
         Processes the checkout by calculating the total and saving the product quantities back to the store.
@@ -108,26 +155,185 @@ class Cart:
             choice = input("Enter your choice (1 for Delivery, 2 for Pickup): ")
 
             if choice == '1':
-                self.process_delivery()
+                fulfilment = 'delivery'
+                address = self.process_delivery()
                 break
             elif choice == '2':
+                fulfilment = 'pickup'
+                address = None
                 self.process_pickup()
                 break
             else:
                 print("Invalid choice. Please enter 1 or 2.")
         
-        self.store.save_products()  # Save the updated product data.
+        try:
+            self.place_order(fulfilment, address)
+        except ValueError as e:  # InsufficientFundsError, OutOfStockError or a product that can no longer be priced.
+            print(f"\n{e} Your cart has been kept.")
+            return False
         print("\nCheckout complete. Thank you for your purchase!")
+        if self.customer is not None:
+            print(f"Remaining funds: ${float(self.customer.fund):.2f}")
         return True
 
+    def place_order(self, fulfilment, address=None, save=True):
+        """
+        Completes the order without any prompts: charges the customer's funds, records the order in the
+        store's order journal and empties the cart.
+
+        Parameters:
+            fulfilment (str): Either 'delivery' or 'pickup'.
+            address (str): The delivery address, if any.
+            save (bool): Whether to compact products.csv if a compaction is due.
+
+        Returns:
+            dict: The order record as written to the journal.
+
+        Raises:
+            InsufficientFundsError: If the customer's balance does not cover the order. The cart is kept.
+            OutOfStockError: If a product in the cart has sold out since the store was loaded. The cart is kept.
+            ValueError: If a product in the cart has no price. The cart is kept.
+        """
+        result = Cart.place_orders([(self, fulfilment, address)], save=save)[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    @staticmethod
+    def place_orders(orders, save=True):
+        """
+        Completes several orders with a single journal commit. The stock they take is derived from the
+        journal, so products.csv is not rewritten here but compacted every StockLedger.compact_every orders.
+        Each customer is charged first; an order the customer cannot pay for is left in its cart. Paid orders
+        are then checked against the stock left, which other stores may have sold since this one was loaded;
+        an order that would oversell is refunded and left in its cart too.
+
+        Parameters:
+            orders (list): Tuples of (Cart, fulfilment, address). All carts must belong to the same store.
+            save (bool): Whether to compact products.csv if a compaction is due. Callers that compact
+                         at a time of their choosing pass False.
+
+        Returns:
+            list: For each order, the order record as written to the journal, or the InsufficientFundsError,
+                  OutOfStockError (or ValueError, for a product without a price) that stopped it.
+        """
+        if not orders:
+            return []
+        store = orders[0][0].store
+
+        results = []
+        charged = []
+        for cart, fulfilment, address in orders:
+            try:
+                record = cart.order_record(fulfilment, address)
+                cart.charge(record)
+            except ValueError as e:  # Also catches InsufficientFundsError.
+                results.append(e)
+                continue
+            charged.append((len(results), cart, record))
+            results.append(record)
+
+        if not charged:
+            return results
+
+        # Check stock and journal under the products.csv lock: other stores, here or in other processes,
+        # may have sold the stock this store still shows since it was loaded.
+        accepted = []
+        rejected = []
+        with store.stock.selling() as available:
+            taken = {}
+            for position, cart, record in charged:
+                ordered, names = {}, {}
+                for line in record['lines']:
+                    ordered[line['product_id']] = ordered.get(line['product_id'], 0) + line['quantity']
+                    names[line['product_id']] = line['name'].strip()
+                short = [names[product_id] for product_id, quantity in ordered.items()
+                         if available(product_id) - taken.get(product_id, 0) < quantity]
+                if short:
+                    error = OutOfStockError(f"Not enough stock left of {', '.join(short)}.")
+                    rejected.append((position, cart, record, error))
+                    continue
+                for product_id, quantity in ordered.items():
+                    taken[product_id] = taken.get(product_id, 0) + quantity
+                accepted.append((position, cart, record))
+
+            try:
+                written = store.journal.append_many([record for _, _, record in accepted])
+            except OSError:
+                for _, cart, record in charged:
+                    cart.refund(record)
+                raise
+        for position, cart, record, error in rejected:
+            cart.refund(record)
+            results[position] = error
+        for (position, cart, _), record in zip(accepted, written):
+            results[position] = record
+            cart.items = []
+        if save and accepted:
+            store.stock.compact_if_due()
+        return results
+
+    def charge(self, record):
+        """
+        Debits the order total from the customer's funds. Carts without a customer are not charged.
+
+        Parameters:
+            record (dict): The order record from order_record().
+        """
+        if self.customer is not None:
+            balance = FundLedger.open(self.customer.data_path).debit(
+                self.customer.user_id, record['total_cents'], reference=record['order_id'])
+            self.customer.fund = f'{balance / 100:.2f}'
+
+    def refund(self, record):
+        """
+        Credits a charged order total back to the customer's funds.
+
+        Parameters:
+            record (dict): The order record passed to charge().
+        """
+        if self.customer is not None:
+            balance = FundLedger.open(self.customer.data_path).credit(
+                self.customer.user_id, record['total_cents'], reference=f"refund {record['order_id']}")
+            self.customer.fund = f'{balance / 100:.2f}'
+
+    def order_record(self, fulfilment, address=None):
+        """
+        Describes the cart contents as an order for the journal.
+
+        Parameters:
+            fulfilment (str): Either 'delivery' or 'pickup'.
+            address (str): The delivery address, if any.
+
+        Returns:
+            dict: The order with user id, lines, total (in dollars and, exactly, in cents), fulfilment type and address.
+        """
+        quote = self.quote()
+        return {
+            'order_id': uuid.uuid4().hex,
+            'user_id': self.customer.user_id if self.customer is not None else None,
+            'member': self.is_member,
+            'lines': [{'product_id': line['product'].id, 'name': line['product'].name,
+                       'quantity': line['quantity'], 'price': line['unit_cents'] / 100}
+                      for line in quote['lines']],
+            'total': quote['total_cents'] / 100,
+            'total_cents': quote['total_cents'],
+            'fulfilment': fulfilment,
+            'address': address,
+        }
+
     def process_delivery(self):
         """
         Handles the delivery option for checkout.
+
+        Returns:
+            str: The delivery address entered by the customer.
         """
         print("\nYou have selected Delivery.")
         # Simulate delivery process
         address = input("Please enter your delivery address: ")
         print(f"Your order will be delivered to: {address}")
+        return address
 
     def process_pickup(self):
         """
@@ -138,23 +344,44 @@ class Cart:
         print("Your order will be ready for pickup at the store.")
 
 class Store:
-    def __init__(self):
+    def __init__(self, filepath=None, customer=None):
         """
         Represents a store which manages products and a shopping cart.
 
+        Parameters:
+            filepath (str): The path to products.csv. The user is prompted for it if not given.
+            customer (Customer): The customer shopping in the store, if known.
+
         Attributes:
             filepath (str): The path to the product data file.
             products_df (DataFrame): A pandas DataFrame containing product data.
             products (list): A list of Product objects.
             cart (Cart): A shopping cart associated with the store.
+            journal (OrderJournal): The append-only order journal kept next to products.csv.
+            stock (StockLedger): Current stock as products.csv less the orders journalled since it was compacted.
+            price_book (PriceBook): Retail and member prices in cents, used to price carts.
+            restock_monitor (RestockMonitor): Products ordered by stock above their reorder point.
         """
-        self.filepath = self.prompt_for_filepath()  # Initialize file path on creation.
+        from util.pricing import PriceBook  # Imported here so that start-up does not load numpy.
+
+        # Initialize file path on creation.
+        self.filepath = filepath if filepath is not None else self.prompt_for_filepath()
+        self.journal = OrderJournal.open(os.path.join(os.path.dirname(self.filepath), 'orders.jsonl'))
+        self.stock = StockLedger.open(self.filepath)
         self.products_df = self.load_products()  # Load products from the file.
         # Initialize products list by parsing data frame.
         self.products = [
             Product(row['product_id'], row['product_name'], row['product_brand'], row['product_description'],
-                    row['product_price'], row['product_quantity']) for index, row in self.products_df.iterrows()]
-        self.cart = Cart(self)  # Associate a cart with the store.
+                    row['product_price'], row['product_quantity'], row.get('product_member_price'))
+            for index, row in self.products_df.iterrows()]
+        self._products_by_id = {int(product.id): product for product in self.products}
+        catalog = self.products_df
+        if not {'product_id', 'product_price', 'product_quantity'}.issubset(catalog.columns):
+            # An empty or malformed products.csv (see load_products) makes an empty store.
+            catalog = load_pandas().DataFrame(columns=['product_id', 'product_price', 'product_quantity'])
+        self.price_book = PriceBook.from_dataframe(catalog)
+        self.restock_monitor = RestockMonitor.from_dataframe(catalog)
+        self.cart = Cart(self, customer)  # Associate a cart with the store.
 
     def prompt_for_filepath(self):
         """
@@ -179,15 +406,18 @@ class Store:
             else:
                 print("Error: The file path specified does not exist. Please try again.")
 
+    @instrumented('Store.load_products')
     def load_products(self):
         """
-        Loads products from a CSV file into a DataFrame.
+        Loads products from a CSV file into a DataFrame, using the binary snapshot when it is up to date.
+        Quantities are current: orders journalled since products.csv was last compacted are subtracted.
 
         Returns:
             DataFrame: The loaded product data.
         """
+        pd = load_pandas()
         try:
-            df = pd.read_csv(self.filepath)
+            df = self.stock.load()
             df.columns = [col.strip() for col in df.columns]
             return df
         except FileNotFoundError:
@@ -197,13 +427,38 @@ class Store:
             print(f"Unexpected error loading products: {e}")
             return pd.DataFrame()
 
+    def set_quantity(self, product):
+        """
+        Writes a product's current quantity back into the product data.
+
+        Parameters:
+            product (Product): The product whose quantity changed.
+        """
+        with measure('Store.set_quantity.mask'):
+            self.products_df.loc[self.products_df['product_id'] == product.id, 'product_quantity'] = product.quantity
+        self.restock_monitor.update(product.id, product.quantity)
+
+    def low_stock(self):
+        """
+        Lists the products at or below their reorder point.
+
+        Returns:
+            list: Tuples of (Product, quantity, reorder_point), lowest stock first.
+        """
+        return [(self._products_by_id[product_id], quantity, reorder_point)
+                for product_id, quantity, reorder_point in self.restock_monitor.below_threshold()
+                if product_id in self._products_by_id]
+
+    @instrumented('Store.save_products')
     def save_products(self):
         """
-        Saves the updated product quantities back to the CSV file.
+        Folds the stock sold since the last compaction into products.csv now. Only journalled orders are
+        written, never this store's in-memory catalog, so changes made by others since it was loaded are kept.
         """
-        self.products_df.to_csv(self.filepath, index=False)  # Save the DataFrame to CSV.
+        self.stock.compact()
         print("\nProduct quantities updated.")
 
+    @instrumented('Store.display_products')
     def display_products(self):
         """
         Displays all products available in the store.
@@ -255,5 +510,10 @@ class Store:
 
             elif user_input == '3':
                 # Checkout decision logic.
-                while True:
-                    print
+                self.cart.checkout()
+
+            elif user_input == '4':
+                break
+
+            else:
+                print("Invalid choice. Please enter a number between 1 and 4.")
@@ -0,0 +1,357 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from cart_management import Cart, Store
+from InventoryManagement.index import ProductManager
+from model.user import User, UserRole
+from util.catalog_snapshot import read_products, write_products
+from util.csv_table import CsvTable
+from util.fund_ledger import FundLedger, InsufficientFundsError
+from util.instrumentation import measure, report, reset, set_enabled
+from util.order_journal import OrderJournal
+from util.stock_ledger import OutOfStockError, StockLedger
+
+DATA_FILES = ['users.csv', 'customer.csv', 'products.csv', 'categories.csv', 'subcategories.csv']
+
+
+class InstrumentedLock(object):
+    """
+    A lock that counts how often it was acquired and how often, and for how long, a thread had to wait for it.
+    Wraps a threading.Lock or RLock and can be used wherever those are, including in a threading.Condition.
+    """
+
+    def __init__(self, name: str, lock=None) -> None:
+        """
+        The __init__ method for InstrumentedLock.
+        :param name: The name to report the lock under.
+        :param lock: (Optional) The lock to wrap, defaults to a new threading.Lock.
+        """
+        self.name = name
+        self._lock = lock if lock is not None else threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._lock.acquire(blocking=False):
+            self.acquisitions += 1  # Only updated while the lock is held.
+            return True
+        if not blocking:
+            return False
+        start = time.perf_counter()
+        with measure(f'lock.{self.name}.wait'):
+            acquired = self._lock.acquire(timeout=timeout)
+        if acquired:
+            self.acquisitions += 1
+            self.contended += 1
+            self.wait_seconds += time.perf_counter() - start
+        return acquired
+
+    def release(self) -> None:
+        self._lock.release()
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class LoadTest(object):
+    """
+    Simulated customers and administrators working concurrently against the shared data files through
+    User.login, Store, Cart and ProductManager, on a copy of the data directory.
+
+    Customers log in, browse, fill a cart and check out. With a shared store (the default, as in the shop
+    server) all customers work on one in-memory catalog; with store_per_session each login loads its own
+    Store, as separate copies of the terminal app would. Administrators log in, change prices and add products.
+    """
+
+    def __init__(self, source_data_path: str = 'data', customers: int = 8, admins: int = 2,
+                 duration: float = 5.0, stock: int = 1000, store_per_session: bool = False,
+                 seed: int | None = None) -> None:
+        """
+        The __init__ method for LoadTest.
+        :param source_data_path: The data directory to copy.
+        :param customers: The number of customer workers.
+        :param admins: The number of administrator workers.
+        :param duration: How long the workers run, in seconds.
+        :param stock: The quantity every product starts with. Keep it low to check that stock cannot be oversold.
+        :param store_per_session: Whether each customer login loads its own Store instead of sharing one.
+        :param seed: (Optional) Seed for the random choices of the workers.
+        """
+        self.source_data_path = source_data_path
+        self.customers = customers
+        self.admins = admins
+        self.duration = duration
+        self.stock = stock
+        self.store_per_session = store_per_session
+        self.seed = seed
+        self.data_path = None
+        self._store_lock = InstrumentedLock('store')
+        self._counts_lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._added: Dict[str, int] = {}  # Name -> quantity of the products added by administrators.
+
+    def run(self) -> Dict:
+        """
+        Copy the data, run the workers for the configured duration and check the inventory afterwards.
+        :return: A dict with 'elapsed', 'counts', 'errors', 'locks', 'latency' and 'consistency'.
+        """
+        from util import instrumentation
+
+        was_enabled = instrumentation.enabled
+        set_enabled(True)
+        reset()
+        self.data_path = tempfile.mkdtemp(prefix='merchant-load-')
+        try:
+            credentials = self._prepare_data()
+            self.products_file = os.path.join(self.data_path, 'products.csv')
+            self.initial_stock = self._stock_levels()
+            self.journal = OrderJournal.open(os.path.join(self.data_path, 'orders.jsonl'))
+            self.journal._cond = threading.Condition(InstrumentedLock('OrderJournal'))
+            ledger = FundLedger.open(self.data_path)
+            ledger._lock = InstrumentedLock('FundLedger', ledger._lock)
+            ledger._file_lock._lock = InstrumentedLock('fund_ledger.lock', ledger._file_lock._lock)
+            stock = StockLedger.open(self.products_file)
+            stock._lock = InstrumentedLock('StockLedger', stock._lock)
+            stock._file_lock._lock = InstrumentedLock('products.csv.lock', stock._file_lock._lock)
+            self.store = None if self.store_per_session else Store(filepath=self.products_file)
+
+            workers = [threading.Thread(target=self._worker, args=(self._customer_flow, credentials['customer'], i))
+                       for i in range(self.customers)]
+            workers += [threading.Thread(target=self._worker, args=(self._admin_flow, credentials['administrator'], i))
+                        for i in range(self.admins)]
+            start = time.perf_counter()
+            self._deadline = start + self.duration
+            with contextlib.redirect_stdout(io.StringIO()):  # Hide the app's own messages.
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+            elapsed = time.perf_counter() - start
+
+            consistency = self._check_inventory()
+            self.journal.close()
+            ledger.close()
+            return {
+                'elapsed': elapsed,
+                'counts': dict(self._counts),
+                'errors': dict(self._errors),
+                'locks': {lock.name: {'acquisitions': lock.acquisitions, 'contended': lock.contended,
+                                      'wait_ms': lock.wait_seconds * 1000}
+                          for lock in [self._store_lock, self.journal._cond._lock, ledger._lock, ledger._file_lock._lock,
+                                       stock._lock, stock._file_lock._lock]},
+                'latency': instrumentation.summary(),
+                'consistency': consistency,
+            }
+        finally:
+            OrderJournal._journals.pop(os.path.abspath(os.path.join(self.data_path, 'orders.jsonl')), None)
+            FundLedger._ledgers.pop(os.path.abspath(self.data_path), None)
+            StockLedger._ledgers.pop(os.path.abspath(os.path.join(self.data_path, 'products.csv')), None)
+            shutil.rmtree(self.data_path, ignore_errors=True)
+            set_enabled(was_enabled)
+
+    def _prepare_data(self) -> Dict[str, List[Dict[str, str]]]:
+        """Copy the data files, raise the stock of every product and give customers enough funds."""
+        for name in DATA_FILES:
+            source = os.path.join(self.source_data_path, name)
+            if os.path.exists(source):
+                shutil.copy(source, self.data_path)
+        products_file = os.path.join(self.data_path, 'products.csv')
+        df = read_products(products_file)
+        df['product_quantity'] = self.stock
+        write_products(df, products_file)
+
+        users = CsvTable(name='users', column_names=['user_id', 'role', 'email', 'password'],
+                         data_path=self.data_path).select(where={})
+        credentials = {role.value: [user for user in users if user['role'] == role.value] for role in UserRole}
+        if self.customers and not credentials['customer'] or self.admins and not credentials['administrator']:
+            raise ValueError('The data directory needs at least one customer and one administrator.')
+        ledger = FundLedger.open(self.data_path)
+        for user in credentials['customer']:
+            ledger.credit(user['user_id'], 10 ** 9, reference='load test top-up')
+        return credentials
+
+    def _worker(self, flow, credentials: List[Dict[str, str]], number: int) -> None:
+        rng = random.Random(None if self.seed is None else self.seed * 1000 + number)
+        iteration = 0
+        while time.perf_counter() < self._deadline:
+            user = credentials[(number + iteration) % len(credentials)]
+            try:
+                flow(user, rng, f'{number}-{iteration}')
+            except Exception as e:
+                self._count(type(e).__name__, self._errors)
+            iteration += 1
+
+    def _customer_flow(self, credentials: Dict[str, str], rng: random.Random, tag: str) -> None:
+        with measure('load_test.customer.flow'):
+            with measure('load_test.customer.login'):
+                user = User.login(email=credentials['email'], password=credentials['password'],
+                                  data_path=self.data_path)
+            with measure('load_test.customer.browse'):
+                if self.store_per_session:
+                    store = Store(filepath=self.products_file, customer=user)
+                    cart = store.cart
+                else:
+                    store = self.store
+                    cart = Cart(store, customer=user)
+                in_stock = [product for product in store.products if product.quantity > 0]
+
+            # A store of its own needs no locking; the shared store is guarded like the shop server's event loop.
+            lock = contextlib.nullcontext() if self.store_per_session else self._store_lock
+            with measure('load_test.customer.add_to_cart'):
+                for product in rng.sample(in_stock, min(len(in_stock), rng.randint(1, 3))):
+                    quantity = rng.randint(1, 3)
+                    with lock:
+                        if quantity <= product.quantity:  # Cart.reserve leaves the stock check to the caller.
+                            cart.reserve(product, quantity)
+            if not cart.items:
+                self._count('empty carts')
+                return
+
+            with measure('load_test.customer.checkout'):
+                try:
+                    cart.place_order('pickup')
+                except InsufficientFundsError:
+                    with lock:
+                        cart.clear()
+                    self._count('declined orders')
+                    return
+                except OutOfStockError:  # Sold by another store since this one was loaded.
+                    with lock:
+                        cart.clear()
+                    self._count('sold out orders')
+                    return
+            self._count('orders')
+
+    def _admin_flow(self, credentials: Dict[str, str], rng: random.Random, tag: str) -> None:
+        with measure('load_test.admin.flow'):
+            with measure('load_test.admin.login'):
+                User.login(email=credentials['email'], password=credentials['password'], data_path=self.data_path)
+                manager = ProductManager(self.data_path)
+            if rng.random() < 0.8:
+                with measure('load_test.admin.update_product'):
+                    product_id = rng.choice(list(self.initial_stock))
+                    manager.set_product_field(product_id, 'product_price', str(rng.randint(100, 500)))
+                self._count('price updates')
+            else:
+                name = f'Load test product {tag}'
+                quantity = rng.randint(1, 50)
+                with measure('load_test.admin.add_product'):
+                    manager.add_product({
+                        'product_name': name, 'product_brand': 'Load test', 'product_description': 'Load test',
+                        'product_price': 100, 'product_member_price': 90, 'product_quantity': quantity,
+                        'product_category': 'test', 'product_sub_category': 'test', 'product_expiry': '',
+                        'product_ingredients': '', 'product_storage_instructions': '', 'product_allergens': ''})
+                with self._counts_lock:
+                    self._added[name] = quantity
+                self._count('products added')
+
+    def _stock_levels(self) -> Dict[int, int]:
+        df = read_products(self.products_file)
+        return dict(zip(df['product_id'].astype(int).tolist(), df['product_quantity'].astype(int).tolist()))
+
+    def _check_inventory(self) -> Dict:
+        """
+        Compact the journalled sales into products.csv, then compare the stock left in it with the starting stock
+        less everything the order journal says was sold. Stock lower than that was lost; higher means sales were
+        overwritten by a stale save.
+        """
+        StockLedger.open(self.products_file).compact()
+        sold = self.journal.stock_decrements()
+        df = read_products(self.products_file)
+        final = dict(zip(df['product_id'].astype(int).tolist(), df['product_quantity'].astype(int).tolist()))
+        names = set(df['product_name'].astype(str).str.strip())
+
+        problems = []
+        for product_id, initial in sorted(self.initial_stock.items()):
+            expected = initial - sold.get(product_id, 0)
+            actual = final.get(product_id)
+            if actual is None:
+                problems.append({'product_id': product_id, 'problem': 'product missing'})
+            elif expected < 0 or actual < 0:
+                problems.append({'product_id': product_id, 'problem': 'oversold', 'sold': sold.get(product_id, 0),
+                                 'initial': initial, 'actual': actual})
+            elif actual != expected:
+                problems.append({'product_id': product_id,
+                                 'problem': 'lost stock' if actual < expected else 'sales not in stock',
+                                 'expected': expected, 'actual': actual})
+        lost_products = sorted(name for name in self._added if name not in names)
+        if lost_products:
+            problems.append({'problem': 'added products missing', 'count': len(lost_products),
+                             'examples': lost_products[:5]})
+        return {'ok': not problems, 'orders_journalled': sum(1 for _ in self.journal.replay()),
+                'units_sold': sum(sold.values()), 'problems': problems}
+
+    def _count(self, name: str, counts: Dict[str, int] | None = None) -> None:
+        counts = self._counts if counts is None else counts
+        with self._counts_lock:
+            counts[name] = counts.get(name, 0) + 1
+
+
+def print_results(results: Dict, stream=None) -> None:
+    """
+    Print the outcome of a load test: throughput, tail latency, lock contention and inventory consistency.
+    :param results: The dict returned by LoadTest.run().
+    :param stream: (Optional) The stream to write to, defaults to stdout.
+    :return: None
+    """
+    stream = stream if stream is not None else sys.stdout
+    elapsed = results['elapsed']
+    print(f"\nRan for {elapsed:.2f} s", file=stream)
+    for name, count in sorted(results['counts'].items()):
+        print(f"  {name:<24} {count:>8}  ({count / elapsed:.1f}/s)", file=stream)
+    for name, count in sorted(results['errors'].items()):
+        print(f"  error {name:<18} {count:>8}", file=stream)
+
+    print("\nLatency (ms)", file=stream)
+    for name, stat in results['latency'].items():
+        if name.startswith('load_test.'):
+            print(f"  {name[len('load_test.'):]:<24} p50 {stat['p50_ms']:>9.2f}  p95 {stat['p95_ms']:>9.2f}  "
+                  f"p99 {stat['p99_ms']:>9.2f}  max {stat['max_ms']:>9.2f}", file=stream)
+
+    print("\nLock contention", file=stream)
+    for name, lock in results['locks'].items():
+        share = lock['contended'] / lock['acquisitions'] if lock['acquisitions'] else 0.0
+        print(f"  {name:<24} {lock['acquisitions']:>8} acquired, {share:>6.1%} contended, "
+              f"{lock['wait_ms']:>9.1f} ms waiting", file=stream)
+
+    consistency = results['consistency']
+    print(f"\nInventory: {consistency['orders_journalled']} orders journalled, "
+          f"{consistency['units_sold']} units sold - {'consistent' if consistency['ok'] else 'INCONSISTENT'}",
+          file=stream)
+    for problem in consistency['problems']:
+        print(f"  {problem}", file=stream)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Simulate concurrent customers and administrators on a copy of the data directory.')
+    parser.add_argument('--data-path', default='data')
+    parser.add_argument('--customers', type=int, default=8)
+    parser.add_argument('--admins', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds to run for.')
+    parser.add_argument('--stock', type=int, default=1000, help='Starting quantity of every product.')
+    parser.add_argument('--store-per-session', action='store_true',
+                        help='Load a Store per customer login, like separate copies of the terminal app.')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--profile', action='store_true', help='Also print the full timing table.')
+    args = parser.parse_args()
+
+    results = LoadTest(args.data_path, customers=args.customers, admins=args.admins, duration=args.duration,
+                       stock=args.stock, store_per_session=args.store_per_session, seed=args.seed).run()
+    print_results(results)
+    if args.profile:
+        report(stream=sys.stdout)
+    sys.exit(0 if results['consistency']['ok'] else 1)
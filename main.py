@@ -1,7 +1,14 @@
+import time
+
+_STARTED = time.perf_counter()
+
+from util.instrumentation import record
+from util.lazy_pandas import preload_pandas
 from util.user_interface import OptionsScreen
 from util.user_interface import QuestionnaireScreen
-from model.user import User, Administrator, Customer, UserRole
-from cart_management import Store
+from model.session import RecentUsers, Session
+from model.user import Administrator, Customer, UserRole
+from InventoryManagement.analytics import InventoryAnalytics
 
 
 def show_initial_screen() -> str:
@@ -18,9 +25,10 @@ def show_initial_screen() -> str:
     return action
 
 
-def show_login_screen() -> Administrator | Customer | None:
+def show_login_screen(recent_users: RecentUsers) -> Administrator | Customer | None:
     """
     This function shows login questions one by one
+    :param recent_users: RecentUsers object, answers repeat logins without reading the user files
     :return: Logged-in user or None
     """
     login_screen = QuestionnaireScreen(
@@ -32,7 +40,7 @@ def show_login_screen() -> Administrator | Customer | None:
 
     response = login_screen.display()
 
-    current_user = User.login(
+    current_user = recent_users.login(
         email=response['email'],
         password=response['password'],
     )
@@ -45,11 +53,10 @@ def show_login_screen() -> Administrator | Customer | None:
     return current_user
 
 
-def show_admin_account_screen(user: Administrator, store: Store | None = None) -> str:
+def show_admin_account_screen(session: Session) -> str:
     """
     This functions shows options available to logged-in administrator.
-    :param user: Administrator object
-    :param store: Store object
+    :param session: Session object of the logged-in administrator
     :return: The option selected by the user
     """
     user_screen = OptionsScreen(
@@ -58,6 +65,7 @@ def show_admin_account_screen(user: Administrator, store: Store | None = None) -
                  'add a new product',
                  'add a new category',
                  'add a new subcategory',
+                 'view inventory and sales reports',
                  'log out']
     )
     action = user_screen.display()
@@ -65,12 +73,38 @@ def show_admin_account_screen(user: Administrator, store: Store | None = None) -
     return action
 
 
-def show_customer_account_screen(user: Customer, store: Store | None = None) -> str:
+def show_reports_screen(analytics: InventoryAnalytics) -> None:
+    """
+    This function shows the inventory and sales reports to a logged-in administrator.
+    :param analytics: InventoryAnalytics object, kept between calls so unchanged data is not recomputed
+    :return: None
+    """
+    period_screen = OptionsScreen(
+        title='Inventory and sales reports\nGroup sales by',
+        options=['day', 'week', 'month']
+    )
+    period = period_screen.display()
+    if period is None:
+        return
+    reports = analytics.reports(period=period)
+    valuation = reports['valuation']
+    print(f"\nInventory: {valuation['products']} products, {valuation['units']} units\n"
+          f"Value at retail price: ${valuation['retail_value']:.2f}\n"
+          f"Value at member price: ${valuation['member_value']:.2f}")
+    for title, key in [('Stock by category', 'stock_by_category'),
+                       ('Sales by product', 'sales_by_product'),
+                       (f'Sales by {period}', 'sales_by_period')]:
+        print(f'\n{title}:')
+        print(reports[key].to_string(index=False) if not reports[key].empty else 'None')
+
+
+def show_customer_account_screen(session: Session) -> str:
     """
     This functions shows options available to logged-in customer.
-    :param user: Customer object
+    :param session: Session object of the logged-in customer, keeps the store and cart between visits
     :return: The option selected by the user
     """
+    user = session.user
     user_screen = OptionsScreen(
         title=f'{user.first_name} {user.last_name} ({user.email})\n'
               'Welcome to Monash Merchant supermarket',
@@ -81,13 +115,10 @@ def show_customer_account_screen(user: Customer, store: Store | None = None) ->
     )
     action = user_screen.display()
     print(repr(action))
-    if action == 'go to Products' or action == 'go to shopping cart':
-        if not store:
-            store = Store()
-        if action == 'go to Products':
-            store.display_products()
-        elif action == 'go to shopping cart':
-            store.run()
+    if action == 'go to Products':
+        session.store.display_products()
+    elif action == 'go to shopping cart':
+        session.store.run()
     return action
 
 
@@ -96,21 +127,23 @@ def main() -> None:
     This is the entry point for the app
     :return: None
     """
-    store = None
+    recent_users = RecentUsers()
+    record('startup.time_to_first_prompt', time.perf_counter() - _STARTED)
     while True:
         user_action = show_initial_screen()
 
         if user_action == 'Exit':
             break
 
-        user = show_login_screen()
+        user = show_login_screen(recent_users)
         if user is None:
             print('Invalid email or password')
             continue
+        session = Session(user)
 
         if user.role == UserRole.Administrator:
             while True:
-                user_action = show_admin_account_screen(user, store)
+                user_action = show_admin_account_screen(session)
                 if user_action == 'log out':
                     break
                 if user_action == 'update / delete existing product':
@@ -121,14 +154,17 @@ def main() -> None:
                     pass  # TODO: Add action
                 elif user_action == 'add a new subcategory':
                     pass  # TODO: Add action
+                elif user_action == 'view inventory and sales reports':
+                    show_reports_screen(session.analytics)
         elif user.role == UserRole.Customer:
-            store = None
+            preload_pandas()  # Warm up the catalog dependencies while the customer reads the menu.
             while True:
-                user_action = show_customer_account_screen(user, store)
+                user_action = show_customer_account_screen(session)
                 if user_action == 'log out':
                     break
                 if user_action in ['go to Account Management', 'go to Products', 'go to shopping cart']:
                     continue
+        session.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import hmac
+import os
+from collections import OrderedDict
+from typing import Tuple
+
+from cart_management import Cart, Store
+from InventoryManagement.analytics import InventoryAnalytics
+from model.user import Administrator, Customer, User
+from util.instrumentation import instrumented
+from util.stock_ledger import StockLedger
+
+
+class RecentUsers(object):
+    """
+    A least-recently-used cache of the profiles of recently logged-in users. Logging in again with the
+    same email and password is answered from memory while users.csv and customer.csv are unchanged.
+    """
+
+    def __init__(self, capacity: int = 32) -> None:
+        """
+        The __init__ method for RecentUsers.
+        :param capacity: (Optional) The number of profiles to keep.
+        """
+        self.capacity = capacity
+        self._users: OrderedDict[Tuple[str, str], Tuple[Tuple, Customer | Administrator]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    @instrumented('RecentUsers.login')
+    def login(self, email: str, password: str, data_path: str = 'data') -> Customer | Administrator | None:
+        """
+        Log in like User.login, reusing the profile of a recent login when the user files have not changed.
+        :param email: The email to lookup.
+        :param password: The password to lookup.
+        :param data_path: The path to the directory containing users.csv and customer.csv.
+        :return: If successful a Customer() or Administrator() object, otherwise None.
+        """
+        key = (os.path.abspath(data_path), email)
+        version = self._data_version(data_path)
+        cached = self._users.get(key)
+        if cached is not None and cached[0] == version:
+            self._users.move_to_end(key)
+            user = cached[1]
+            if hmac.compare_digest(user.password.encode(), password.encode()):
+                return user
+            return None
+
+        user = User.login(email=email, password=password, data_path=data_path)
+        if user is None:
+            return None
+        self._users[key] = (version, user)
+        self._users.move_to_end(key)
+        while len(self._users) > self.capacity:
+            self._users.popitem(last=False)
+        return user
+
+    @staticmethod
+    def _data_version(data_path: str) -> Tuple:
+        version = []
+        for name in ('users.csv', 'customer.csv'):
+            try:
+                stat = os.stat(os.path.join(data_path, name))
+                version.extend([stat.st_size, stat.st_mtime_ns])
+            except FileNotFoundError:
+                version.extend([None, None])
+        return tuple(version)
+
+
+class Session(object):
+    """
+    Everything that belongs to one login: the user, and the store, cart and reports they work with.
+    Each is created on first use and then kept for the rest of the login, so moving between menus does
+    not reload an unchanged catalog or lose the cart. The store is reloaded when products.csv or the order
+    journal changed and the cart is empty, so that prices, products and stock do not go stale.
+    """
+
+    def __init__(self, user: Customer | Administrator, data_path: str = 'data') -> None:
+        """
+        The __init__ method for Session.
+        :param user: The logged-in user.
+        :param data_path: The path to the directory containing products.csv.
+        """
+        self.user = user
+        self.data_path = data_path
+        self._store: Store | None = None
+        self._store_version = None  # Stock version the store was loaded at.
+        self._analytics: InventoryAnalytics | None = None
+
+    @property
+    def store(self) -> Store:
+        """
+        The store, loaded on first use. The user is only asked for products.csv if it is not in data_path.
+        :return: The Store.
+        """
+        if self._store is not None and not self._store.cart.items \
+                and self._store.stock.version() != self._store_version:
+            self._store = None  # Changed by an admin or another session; an unpaid cart keeps its store.
+        if self._store is None:
+            filepath = os.path.join(self.data_path, 'products.csv')
+            filepath = filepath if os.path.exists(filepath) else None
+            version = StockLedger.open(filepath).version() if filepath is not None else None
+            self._store = Store(filepath=filepath, customer=self.user if isinstance(self.user, Customer) else None)
+            self._store_version = version if version is not None else self._store.stock.version()
+        return self._store
+
+    @property
+    def cart(self) -> Cart:
+        """
+        The user's cart in the store.
+        :return: The Cart.
+        """
+        return self.store.cart
+
+    @property
+    def analytics(self) -> InventoryAnalytics:
+        """
+        The inventory and sales reports, cached for the rest of the login.
+        :return: The InventoryAnalytics.
+        """
+        if self._analytics is None:
+            self._analytics = InventoryAnalytics(self.data_path)
+        return self._analytics
+
+    def close(self) -> None:
+        """
+        End the session, returning stock held in an unpaid cart to the store.
+        :return: None
+        """
+        if self._store is not None:
+            self._store.cart.clear()
+        self._store = self._analytics = None
@@ -3,6 +3,7 @@ from __future__ import annotations
 from enum import Enum
 
 from util.csv_table import CsvTable
+from util.instrumentation import instrumented
 
 
 class UserRole(Enum):
@@ -27,6 +28,7 @@ class User(object):
         self.password = password
 
     @staticmethod
+    @instrumented('User.login')
     def login(email: str, password: str, data_path: str = 'data') -> Customer | Administrator | None:
         """
         The login method used to log into the system.
@@ -85,6 +87,7 @@ class Customer(User):
             email=email,
             password=password
         )
+        self.data_path = data_path
         customer_table = CsvTable(
             name='customer',
             column_names=['user_id', 'first_name', 'last_name', 'date_of_birth',
@@ -106,6 +109,14 @@ class Customer(User):
         self.fund = customer['fund'] if customer else ''
         self.membership = customer['membership'] if customer else ''
 
+    @property
+    def is_member(self) -> bool:
+        """
+        Whether the customer has a membership, which customer.csv stores as text such as 'True'.
+        :return: True if the customer is a member.
+        """
+        return self.membership.strip().lower() in ('true', 'yes', 'y', '1')
+
 
 class Administrator(User):
     """This class contains the subclass for customer derived from Administrator"""
@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import json
+import os
+
+from cart_management import Cart, Store
+from model.user import User, UserRole
+
+
+class Session(object):
+    """The state of one connected shopper."""
+
+    def __init__(self) -> None:
+        """
+        The __init__ method for Session.
+        """
+        self.user = None
+        self.cart: Cart | None = None
+
+
+class ShopServer(object):
+    """
+    A local asyncio server exposing login, the product catalog and per-session carts as
+    newline-delimited JSON messages. All sessions share one in-memory catalog; checkouts
+    are completed by a single writer task which journals each batch of orders with one
+    group commit. Stock is derived from the journal, so products.csv is only rewritten
+    by the periodic compaction of the store's StockLedger, and once more on close().
+
+    Request example:  {"op": "add_to_cart", "product_id": 1, "quantity": 2}
+    Response example: {"ok": true, "cart": {...}} or {"ok": false, "error": "..."}
+    """
+
+    def __init__(self, data_path: str = 'data') -> None:
+        """
+        The __init__ method for ShopServer.
+        :param data_path: The path to the directory containing users.csv, customer.csv and products.csv.
+        """
+        self.data_path = data_path
+        self.store = Store(filepath=os.path.join(data_path, 'products.csv'))
+        self.products = {product.id: product for product in self.store.products}
+        self.low_stock_ids = {product.id for product, _, _ in self.store.low_stock()}
+        self._checkouts: asyncio.Queue | None = None
+        self._writer_task: asyncio.Task | None = None
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0, path: str | None = None) -> asyncio.AbstractServer:
+        """
+        Start listening on a TCP port, or on a Unix socket if path is given.
+        :param host: The host to bind to.
+        :param port: The port to bind to, 0 picks a free port.
+        :param path: (Optional) The Unix socket path.
+        :return: The asyncio server.
+        """
+        self._checkouts = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._checkout_writer())
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_client, path=path)
+        else:
+            self._server = await asyncio.start_server(self._handle_client, host=host, port=port)
+        return self._server
+
+    async def close(self) -> None:
+        """
+        Stop accepting connections, stop the checkout writer and fold the journalled orders into products.csv.
+        :return: None
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+        await asyncio.to_thread(self.store.stock.compact)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        session = Session()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('Request must be a JSON object.')
+                    response = await self.handle(session, request)
+                except (ValueError, TypeError, KeyError) as e:
+                    response = {'ok': False, 'error': str(e)}
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if session.cart is not None:
+                session.cart.clear()  # Release stock held by an abandoned cart.
+            writer.close()
+
+    async def handle(self, session: Session, request: dict) -> dict:
+        """
+        Handle one request for the given session.
+        :param session: The session of the connection the request arrived on.
+        :param request: The decoded request, its 'op' key selects the operation.
+        :return: The response to send back.
+        """
+        op = request.get('op')
+        if op == 'login':
+            return await self._login(session, request)
+        if op == 'products':
+            return {'ok': True, 'products': [self._product_json(product) for product in self.products.values()]}
+
+        if session.cart is None:
+            return {'ok': False, 'error': 'Please log in as a customer first.'}
+        if op == 'add_to_cart':
+            return self._add_to_cart(session, request)
+        if op == 'view_cart':
+            return {'ok': True, 'cart': self._cart_json(session.cart)}
+        if op == 'checkout':
+            return await self._checkout(session, request)
+        if op == 'logout':
+            session.cart.clear()
+            session.user = session.cart = None
+            return {'ok': True}
+        return {'ok': False, 'error': f'Unknown op {op!r}.'}
+
+    async def _login(self, session: Session, request: dict) -> dict:
+        user = await asyncio.to_thread(
+            User.login, email=request['email'], password=request['password'], data_path=self.data_path)
+        if user is None:
+            return {'ok': False, 'error': 'Invalid email or password'}
+        if user.role != UserRole.Customer:
+            return {'ok': False, 'error': 'Only customers can shop.'}
+        if session.cart is not None:
+            session.cart.clear()
+        session.user = user
+        session.cart = Cart(self.store, customer=user)
+        return {'ok': True, 'user_id': user.user_id, 'first_name': user.first_name, 'last_name': user.last_name}
+
+    def _add_to_cart(self, session: Session, request: dict) -> dict:
+        product = self.products.get(int(request['product_id']))
+        quantity = int(request['quantity'])
+        if product is None:
+            return {'ok': False, 'error': 'Product not found.'}
+        if quantity <= 0:
+            return {'ok': False, 'error': 'Quantity must be positive.'}
+        if quantity > product.quantity:
+            return {'ok': False, 'error': f'{product.name} is low on stock.', 'available': _plain(product.quantity)}
+        session.cart.reserve(product, quantity)
+        return {'ok': True, 'cart': self._cart_json(session.cart)}
+
+    async def _checkout(self, session: Session, request: dict) -> dict:
+        fulfilment = request.get('fulfilment', 'pickup')
+        if fulfilment not in ('delivery', 'pickup'):
+            return {'ok': False, 'error': "Fulfilment must be 'delivery' or 'pickup'."}
+        address = request.get('address')
+        if fulfilment == 'delivery' and not address:
+            return {'ok': False, 'error': 'A delivery address is required.'}
+        if not session.cart.items:
+            return {'ok': False, 'error': 'Your cart is empty.'}
+
+        cart = self._cart_json(session.cart)
+        done = asyncio.get_running_loop().create_future()
+        await self._checkouts.put((session.cart, fulfilment, address, done))
+        try:
+            record = await done
+        except OSError as e:  # The journal write failed; place_orders refunded the charge and kept the cart.
+            return {'ok': False, 'error': str(e)}
+        if isinstance(record, Exception):
+            return {'ok': False, 'error': str(record)}
+        return {'ok': True, 'order_id': record['order_id'], 'order': cart,
+                'fulfilment': fulfilment, 'address': address, 'fund': session.user.fund}
+
+    async def _checkout_writer(self) -> None:
+        """Complete queued checkouts in batches, with one journal commit per batch."""
+        while True:
+            batch = [await self._checkouts.get()]
+            while not self._checkouts.empty():
+                batch.append(self._checkouts.get_nowait())
+
+            try:
+                # One journal group commit for the whole batch; products.csv is compacted when due.
+                records = await asyncio.to_thread(Cart.place_orders, [order[:3] for order in batch])
+            except Exception as e:
+                for *_, done in batch:
+                    if not done.done():
+                        done.set_exception(e)
+            else:
+                for (*_, done), record in zip(batch, records):
+                    if not done.done():
+                        done.set_result(record)
+                self._alert_low_stock()
+
+    def _alert_low_stock(self) -> None:
+        """Report products that have dropped to their reorder point since the last check."""
+        low_stock = self.store.low_stock()
+        for product, quantity, reorder_point in low_stock:
+            if product.id not in self.low_stock_ids:
+                print(f'Restock alert: {product.name.strip()} (ID {product.id}) has {quantity} left, '
+                      f'reorder point {reorder_point}.')
+        self.low_stock_ids = {product.id for product, _, _ in low_stock}
+
+    @staticmethod
+    def _product_json(product) -> dict:
+        return {'id': _plain(product.id), 'name': product.name, 'brand': product.brand,
+                'description': product.description, 'price': _plain(product.price),
+                'member_price': _plain(product.member_price),
+                'quantity': _plain(product.quantity)}
+
+    @staticmethod
+    def _cart_json(cart: Cart) -> dict:
+        quote = cart.quote()
+        lines = [{'product_id': _plain(line['product'].id), 'name': line['product'].name,
+                  'quantity': line['quantity'], 'price': line['unit_cents'] / 100, 'total': line['total_cents'] / 100}
+                 for line in quote['lines']]
+        return {'lines': lines, 'member': cart.is_member, 'total': quote['total_cents'] / 100}
+
+def _plain(value):
+    """Convert numpy scalars to plain Python values for JSON."""
+    return value.item() if hasattr(value, 'item') else value
+
+
+async def serve(data_path: str, host: str, port: int, path: str | None) -> None:
+    """
+    Run the server until cancelled.
+    :param data_path: The path to the data directory.
+    :param host: The host to bind to.
+    :param port: The port to bind to.
+    :param path: (Optional) The Unix socket path.
+    :return: None
+    """
+    shop = ShopServer(data_path=data_path)
+    server = await shop.start(host=host, port=port, path=path)
+    print(f"Serving Monash Merchant on {', '.join(str(s.getsockname()) for s in server.sockets)}")
+    try:
+        await server.serve_forever()
+    finally:
+        await shop.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve Monash Merchant over a local socket.')
+    parser.add_argument('--data-path', default='data')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', default=None, help='Unix socket path to listen on instead of TCP.')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.data_path, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
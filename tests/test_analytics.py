@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestInventoryAnalytics(unittest.TestCase):
+    """The unit tests for the inventory and sales reports"""
+
+    def test_reports(self) -> None:
+        """The unit test to check valuation, category and sales reports and their invalidation"""
+
+        from monash_merchant.InventoryManagement.analytics import InventoryAnalytics
+        from monash_merchant.util.order_journal import OrderJournal
+
+        data_path = tempfile.mkdtemp()
+        try:
+            shutil.copy(os.path.join('..', 'data', 'products.csv'), data_path)
+            analytics = InventoryAnalytics(data_path)
+
+            reports = analytics.reports()
+            self.assertIs(analytics.reports(), reports)  # Cached while the data is unchanged.
+            self.assertEqual(reports['valuation']['units'], 80)
+            self.assertEqual(reports['valuation']['retail_value'],
+                             20 * 300 + 20 * 350 + 10 * 400 + 15 * 100 + 15 * 250)
+            self.assertEqual(reports['valuation']['member_value'], 80 * 23 - 15 * 23 + 15 * 230)
+            by_category = reports['stock_by_category']
+            self.assertEqual(by_category['units'].sum(), 80)
+            self.assertEqual(by_category['products'].sum(), 5)
+            self.assertTrue(reports['sales_by_product'].empty)
+
+            journal = OrderJournal(os.path.join(data_path, 'orders.jsonl'))
+            journal.append({'lines': [{'product_id': 1, 'name': 'Banana', 'quantity': 2, 'price': 23.0},
+                                      {'product_id': 3, 'name': 'Mango', 'quantity': 1, 'price': 400.0}]})
+            journal.append({'lines': [{'product_id': 1, 'name': 'Banana', 'quantity': 3, 'price': 300.0}]})
+            journal.close()
+
+            reports = analytics.reports(period='day')
+            sales = reports['sales_by_product'].set_index('product_id')
+            self.assertEqual(sales.loc[1, 'units'], 5)
+            self.assertEqual(sales.loc[1, 'revenue'], 2 * 23 + 3 * 300)
+            self.assertEqual(sales.loc[3, 'name'], 'Mango')
+            self.assertEqual(reports['sales_by_period']['revenue'].sum(), 2 * 23 + 400 + 3 * 300)
+
+            with self.assertRaises(ValueError):
+                analytics.reports(period='year')
+        finally:
+            shutil.rmtree(data_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
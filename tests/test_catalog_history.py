@@ -0,0 +1,98 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestCatalogHistory(unittest.TestCase):
+    """The unit tests for the delta-encoded product catalog history"""
+
+    def setUp(self) -> None:
+        self.data_path = tempfile.mkdtemp()
+        self.products_file = os.path.join(self.data_path, 'products.csv')
+        shutil.copy(os.path.join('..', 'data', 'products.csv'), self.products_file)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.data_path)
+
+    def test_as_of_rebuilds_every_save(self) -> None:
+        """The unit test to check saves are stored as deltas and the table can be rebuilt at any moment"""
+
+        import pandas as pd
+        from monash_merchant.util.catalog_history import history_dir
+        from monash_merchant.util.catalog_snapshot import CatalogHistory, read_products, write_products
+
+        history = CatalogHistory.open(self.products_file)
+        history.checkpoint_every = 2
+        states = [(time.time(), pd.read_csv(self.products_file))]
+
+        df = read_products(self.products_file)
+        df.loc[df['product_id'] == 1, 'product_quantity'] = 5
+        write_products(df, self.products_file)
+        states.append((time.time(), pd.read_csv(self.products_file)))
+
+        df = df[df['product_id'] != 2]
+        df = pd.concat([df, df[df['product_id'] == 3].assign(product_id=9, product_name=' Kiwi')], ignore_index=True)
+        write_products(df, self.products_file)
+        states.append((time.time(), pd.read_csv(self.products_file)))
+
+        df.loc[df['product_id'] == 9, 'product_price'] = 120
+        write_products(df, self.products_file)  # Third delta, written as a checkpoint.
+        states.append((time.time(), pd.read_csv(self.products_file)))
+
+        with open(os.path.join(history_dir(self.products_file), 'deltas.jsonl')) as file:
+            deltas = [json.loads(line) for line in file]
+        self.assertEqual(deltas[0]['changed'], {'1': {'product_quantity': '5'}})
+        self.assertEqual(deltas[1]['removed'], ['2'])
+        self.assertEqual(list(deltas[1]['changed']), ['9'])
+        self.assertEqual(len(history.timestamps()), 4)  # Baseline checkpoint, two deltas, one checkpoint.
+
+        for timestamp, expected in states:
+            pd.testing.assert_frame_equal(history.as_of(timestamp), expected)
+        with self.assertRaises(KeyError):
+            history.as_of(0)
+
+    def test_outside_edit_starts_new_checkpoint(self) -> None:
+        """The unit test to check the history notices a csv file edited without write_products"""
+
+        import pandas as pd
+        from monash_merchant.util.catalog_snapshot import CatalogHistory, read_products, write_products
+
+        df = read_products(self.products_file)
+        write_products(df.assign(product_quantity=1), self.products_file)
+        df.assign(product_quantity=2).to_csv(self.products_file, index=False)
+        time.sleep(0.01)
+        write_products(df.assign(product_quantity=3), self.products_file)
+
+        history = CatalogHistory.open(self.products_file)
+        quantities = [history.as_of(timestamp)['product_quantity'].iloc[0] for _, timestamp in history.timestamps()]
+        self.assertEqual(quantities[1:], [1, 2, 3])
+
+    def test_saves_from_two_processes_are_all_kept(self) -> None:
+        """The unit test to check two histories of one csv file, as in two processes, keep each other's saves"""
+
+        import pandas as pd
+        from monash_merchant.util.catalog_snapshot import CatalogHistory, _replace_file, read_products
+
+        first, second = CatalogHistory(self.products_file), CatalogHistory(self.products_file)
+        first.checkpoint_every = second.checkpoint_every = 1
+        df = read_products(self.products_file)
+        for quantity, history in enumerate([first, second, first, second, first], start=1):
+            saved = df.assign(product_quantity=quantity)
+            data = saved.to_csv(index=False).encode()
+            with history.saving(saved, data):
+                _replace_file(self.products_file, data)
+
+        saves = second.timestamps()
+        self.assertEqual([seq for seq, _ in saves], [1, 2, 3, 4, 5, 6])
+        quantities = [first.as_of(timestamp)['product_quantity'].iloc[0] for _, timestamp in saves]
+        self.assertEqual(quantities, [20, 1, 2, 3, 4, 5])
+        self.assertEqual(len(pd.read_json(os.path.join(first.directory, 'checkpoints.json'))), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
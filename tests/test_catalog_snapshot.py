@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestCatalogSnapshot(unittest.TestCase):
+    """The unit tests for the binary product catalog snapshot"""
+
+    def setUp(self) -> None:
+        self.data_path = tempfile.mkdtemp()
+        self.products_file = os.path.join(self.data_path, 'products.csv')
+        shutil.copy(os.path.join('..', 'data', 'products.csv'), self.products_file)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.data_path)
+
+    def test_snapshot_matches_csv(self) -> None:
+        """The unit test to check a snapshot load returns the same table as parsing the csv"""
+
+        import pandas as pd
+        from monash_merchant.util.catalog_snapshot import read_products, snapshot_dir
+
+        parsed = read_products(self.products_file)
+        self.assertTrue(os.path.exists(os.path.join(snapshot_dir(self.products_file), 'manifest.json')))
+
+        pd.testing.assert_frame_equal(read_products(self.products_file), parsed)
+        pd.testing.assert_frame_equal(read_products(self.products_file), pd.read_csv(self.products_file))
+
+    def test_snapshot_follows_saves_and_edits(self) -> None:
+        """The unit test to check the snapshot is kept in sync on save and invalidated by outside edits"""
+
+        import pandas as pd
+        from monash_merchant.util.catalog_snapshot import read_products, write_products
+
+        df = read_products(self.products_file)
+        df.loc[df['product_id'] == 1, 'product_quantity'] = 3
+        write_products(df, self.products_file)
+        self.assertEqual(read_products(self.products_file)['product_quantity'].iloc[0], 3)
+
+        with open(self.products_file, mode='a') as file:
+            file.write('9, Kiwi, Zespri, Fresh Kiwi,200,23,7, 12, food, food, 12-03-05, kiwi, ,\n')
+        pd.testing.assert_frame_equal(read_products(self.products_file), pd.read_csv(self.products_file))
+
+    def test_replace_while_parsing_is_not_cached(self) -> None:
+        """The unit test to check a csv file replaced right after it is parsed is not cached as the new file"""
+
+        from unittest import mock
+        import pandas as pd
+        from monash_merchant.util.catalog_snapshot import _replace_file, read_products
+
+        with open(self.products_file, mode='rb') as file:
+            replacement = file.read().replace(b',20,', b',19,', 1)  # Same size, as with most quantity edits.
+        read_csv = pd.read_csv
+
+        def read_csv_then_replace(*args, **kwargs):
+            df = read_csv(*args, **kwargs)
+            _replace_file(self.products_file, replacement)
+            return df
+
+        with mock.patch.object(pd, 'read_csv', read_csv_then_replace):
+            self.assertEqual(read_products(self.products_file)['product_quantity'].iloc[0], 20)
+        self.assertEqual(read_products(self.products_file)['product_quantity'].iloc[0], 19)
+
+
+if __name__ == '__main__':
+    unittest.main()
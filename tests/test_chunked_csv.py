@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestChunkedCsv(unittest.TestCase):
+    """The unit tests for chunked, parallel csv parsing"""
+
+    def setUp(self) -> None:
+        self.data_path = tempfile.mkdtemp()
+        self.products_file = os.path.join(self.data_path, 'products.csv')
+        with open(os.path.join('..', 'data', 'products.csv'), mode='r') as source:
+            header, *rows = source.read().splitlines()
+        with open(self.products_file, mode='w') as file:
+            file.write(header + '\n')
+            for product_id in range(1, 501):
+                file.write(str(product_id) + rows[product_id % len(rows)][rows[0].index(','):] + '\n')
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.data_path)
+
+    def test_byte_ranges_cover_file(self) -> None:
+        """The unit test to check byte ranges are contiguous and end on line boundaries"""
+
+        from monash_merchant.util.chunked_csv import split_byte_ranges
+
+        ranges = split_byte_ranges(self.products_file, chunk_size=1000)
+        self.assertGreater(len(ranges), 1)
+        self.assertEqual(ranges[-1][1], os.path.getsize(self.products_file))
+        with open(self.products_file, mode='rb') as file:
+            data = file.read()
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(data[end - 1:end], b'\n')
+
+    def test_parallel_and_streaming_match_read_csv(self) -> None:
+        """The unit test to check parallel and streamed parsing give the same table as read_csv"""
+
+        import pandas as pd
+        from monash_merchant.util.chunked_csv import PRODUCT_DTYPES, iter_csv_chunks, read_csv_parallel
+
+        expected = pd.read_csv(self.products_file, dtype=PRODUCT_DTYPES)
+
+        parallel = read_csv_parallel(self.products_file, dtype=PRODUCT_DTYPES, chunk_size=4000, workers=2)
+        pd.testing.assert_frame_equal(parallel, expected)
+
+        streamed = pd.concat(iter_csv_chunks(self.products_file, dtype=PRODUCT_DTYPES, chunk_size=4000))
+        pd.testing.assert_frame_equal(streamed.infer_objects(), expected)
+
+    def test_declared_text_columns_stay_text(self) -> None:
+        """The unit test to check a text column holding only numbers in one chunk is not mixed into an object column"""
+
+        import pandas as pd
+        from monash_merchant.util.catalog_snapshot import _column_kind
+        from monash_merchant.util.chunked_csv import PRODUCT_DTYPES, read_csv_parallel
+
+        df = pd.read_csv(self.products_file)
+        df.loc[df['product_id'] <= 100, 'product_name'] = '42'
+        df.loc[df['product_id'] > 100, 'product_category'] = ' food'
+        df.to_csv(self.products_file, index=False)
+
+        parallel = read_csv_parallel(self.products_file, dtype=PRODUCT_DTYPES, chunk_size=4000, workers=2)
+        self.assertEqual(_column_kind(parallel['product_name']), 'string')
+        self.assertEqual(_column_kind(parallel['product_category']), 'string')
+
+    def test_blank_quantity_reads_the_same_at_any_size(self) -> None:
+        """The unit test to check a blank quantity parses in parallel, with the column types of a small file"""
+
+        import pandas as pd
+        from monash_merchant.util.catalog_snapshot import read_products
+        from monash_merchant.util.chunked_csv import PRODUCT_DTYPES, read_csv_parallel
+
+        df = pd.read_csv(self.products_file)
+        df['product_quantity'] = df['product_quantity'].astype('float64')
+        df.loc[df['product_id'] == 250, 'product_quantity'] = float('nan')
+        df.to_csv(self.products_file, index=False)
+
+        parallel = read_csv_parallel(self.products_file, dtype=PRODUCT_DTYPES, chunk_size=4000, workers=2)
+        pd.testing.assert_frame_equal(parallel, read_products(self.products_file))
+        self.assertEqual(parallel['product_quantity'].isna().sum(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
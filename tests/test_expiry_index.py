@@ -0,0 +1,87 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestExpiryIndex(unittest.TestCase):
+    """The unit tests for the expiry-ordered product index"""
+
+    def test_range_queries(self) -> None:
+        """The unit test to check expired and expiring-soon queries"""
+
+        from monash_merchant.util.expiry_index import ExpiryIndex, parse_expiry
+
+        self.assertEqual(parse_expiry(' 12-03-05'), datetime.date(2005, 3, 12))
+        self.assertIsNone(parse_expiry(' food'))
+
+        index = ExpiryIndex()
+        index.set(1, '01-06-26')
+        index.set(2, '05-06-26')
+        index.set(3, '20-06-26')
+        index.set(4, 'not a date')
+        index.set(2, '10-06-26')  # Updated expiry.
+        today = datetime.date(2026, 6, 3)
+
+        self.assertEqual(len(index), 3)
+        self.assertEqual([product_id for _, product_id in index.expired(today)], [1])
+        self.assertEqual([product_id for _, product_id in index.expiring_within(7, today)], [2])
+        index.remove(2)
+        self.assertEqual(index.report(30, today), {'remove': [(datetime.date(2026, 6, 1), 1)],
+                                                   'markdown': [(datetime.date(2026, 6, 20), 3)]})
+
+    def test_product_manager_maintains_index(self) -> None:
+        """The unit test to check ProductManager keeps the index in step with its edits"""
+
+        from monash_merchant.InventoryManagement.index import ProductManager
+
+        data_path = tempfile.mkdtemp()
+        try:
+            shutil.copy(os.path.join('..', 'data', 'products.csv'), data_path)
+            manager = ProductManager(data_path)
+            self.assertEqual(len(manager.expiry_index), 0)  # The sample data holds no valid expiry.
+
+            manager.set_product_field(2, 'product_expiry', '04-06-26')
+            manager.add_product({'product_name': 'Milk', 'product_expiry': '30-05-26', 'product_quantity': 5})
+            report = manager.expiry_report(days=7, today=datetime.date(2026, 6, 1))
+            self.assertEqual([name for _, _, name in report['remove']], ['Milk'])
+            self.assertEqual([product_id for _, product_id, _ in report['markdown']], [2])
+
+            manager.remove_product(2)
+            self.assertEqual(manager.expiry_report(days=7, today=datetime.date(2026, 6, 1))['markdown'], [])
+        finally:
+            shutil.rmtree(data_path)
+
+    def test_sales_do_not_rebuild_the_index(self) -> None:
+        """The unit test to check checkouts only move stock in the restock monitor and keep the expiry index"""
+
+        from monash_merchant.cart_management import Store
+        from monash_merchant.InventoryManagement.index import ProductManager
+
+        data_path = tempfile.mkdtemp()
+        try:
+            shutil.copy(os.path.join('..', 'data', 'products.csv'), data_path)
+            products_file = os.path.join(data_path, 'products.csv')
+            manager = ProductManager(data_path)
+            index = manager.expiry_index
+
+            for quantity, left in [(6, 4), (1, 3)]:
+                store = Store(filepath=products_file)
+                store.cart.reserve(next(p for p in store.products if p.id == 3), quantity)
+                store.cart.place_order('pickup')
+                self.assertIs(manager.expiry_index, index)
+                self.assertEqual([(product_id, stock) for product_id, _, stock, _ in manager.low_stock_report()],
+                                 [(3, left)])
+                manager.set_product_field(2, 'product_price', '400')  # Folds the sale into products.csv.
+                self.assertIs(manager.expiry_index, index)
+                self.assertEqual([(product_id, stock) for product_id, _, stock, _ in manager.low_stock_report()],
+                                 [(3, left)])
+        finally:
+            shutil.rmtree(data_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
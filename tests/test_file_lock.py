@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestFileLock(unittest.TestCase):
+    """The unit tests for the cross-process file lock"""
+
+    def setUp(self) -> None:
+        self.data_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.data_path, 'products.csv.lock')
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.data_path)
+
+    def test_readers_share_and_writers_wait(self) -> None:
+        """The unit test to check shared holders do not wait for each other while an exclusive holder waits for them"""
+
+        from monash_merchant.util.file_lock import FileLock, fcntl
+
+        lock = FileLock(self.path)
+        read, written = threading.Event(), threading.Event()
+
+        def write() -> None:
+            with lock:
+                written.set()
+
+        with lock.shared():
+            reader = threading.Thread(target=self._read, args=(lock, read))
+            reader.start()
+            self.assertTrue(read.wait(5))
+            reader.join()
+            if fcntl is not None:  # Other processes can read, but not write.
+                with open(self.path, mode='a') as other:
+                    fcntl.flock(other.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+                    fcntl.flock(other.fileno(), fcntl.LOCK_UN)
+                    with self.assertRaises(BlockingIOError):
+                        fcntl.flock(other.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+            writer = threading.Thread(target=write)
+            writer.start()
+            self.assertFalse(written.wait(0.2))
+            with self.assertRaises(RuntimeError):
+                lock.acquire()  # Upgrading would wait for itself.
+        self.assertTrue(written.wait(5))
+        writer.join()
+
+        with lock, lock.shared():  # The exclusive holder can read too.
+            pass
+
+    @staticmethod
+    def _read(lock, read: threading.Event) -> None:
+        with lock.shared():
+            read.set()
+
+
+if __name__ == '__main__':
+    unittest.main()
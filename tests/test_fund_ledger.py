@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestFundLedger(unittest.TestCase):
+    """The unit tests for the customer fund ledger"""
+
+    def setUp(self) -> None:
+        self.data_path = tempfile.mkdtemp()
+        for name in ['users.csv', 'customer.csv', 'products.csv']:
+            shutil.copy(os.path.join('..', 'data', name), self.data_path)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.data_path)
+
+    def test_concurrent_debits_never_overdraw(self) -> None:
+        """The unit test to check concurrent debits are atomic against the balance"""
+
+        from monash_merchant.util.fund_ledger import FundLedger, InsufficientFundsError
+
+        ledger = FundLedger(self.data_path)
+        self.assertEqual(ledger.balance('1'), 100000)
+        successes = []
+
+        def spend() -> None:
+            for _ in range(10):
+                try:
+                    ledger.debit('1', 3000)
+                    successes.append(1)
+                except InsufficientFundsError:
+                    pass
+
+        threads = [threading.Thread(target=spend) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(successes), 33)
+        self.assertEqual(ledger.balance('1'), 1000)
+        ledger.close()
+        self.assertEqual(FundLedger(self.data_path).balance('1'), 1000)  # Rebuilt from the ledger file.
+
+    def test_ledgers_of_separate_processes_share_the_balance(self) -> None:
+        """The unit test to check two ledger instances (as in two processes) see each other's debits and compactions"""
+
+        from monash_merchant.util.fund_ledger import FundLedger, InsufficientFundsError
+
+        first, second = FundLedger(self.data_path), FundLedger(self.data_path)
+        first.debit('1', 60000)
+        with self.assertRaises(InsufficientFundsError):
+            second.debit('1', 60000)  # Only 40000 left after the first debit.
+
+        first.compact()  # Replaces the ledger file the second instance appends to.
+        self.assertEqual(second.debit('1', 30000), 10000)
+        self.assertEqual(first.balance('1'), 10000)
+        first.close()
+        second.close()
+        self.assertEqual(FundLedger(self.data_path).balance('1'), 10000)
+
+    def test_compaction(self) -> None:
+        """The unit test to check compaction writes balances back to customer.csv and empties the ledger"""
+
+        from monash_merchant.model.user import User
+        from monash_merchant.util.fund_ledger import FundLedger
+
+        ledger = FundLedger(self.data_path, compact_every=3)
+        ledger.debit('1', 1050)
+        ledger.credit('1', 50)
+        ledger.debit('1', 250)  # Third entry triggers compaction.
+        ledger.close()
+
+        customer = User.login(email='member@student.monash.edu', password='Monash1234', data_path=self.data_path)
+        self.assertEqual(customer.fund, '987.50')
+        with open(os.path.join(self.data_path, 'fund_ledger.csv')) as file:
+            self.assertEqual(len(file.readlines()), 1)
+        self.assertEqual(FundLedger(self.data_path).balance('1'), 98750)
+
+    def test_checkout_debits_funds(self) -> None:
+        """The unit test to check checkout charges the customer and refuses orders they cannot pay for"""
+
+        from monash_merchant.cart_management import InsufficientFundsError, Store
+        from monash_merchant.model.user import User
+
+        customer = User.login(email='member@student.monash.edu', password='Monash1234', data_path=self.data_path)
+        store = Store(filepath=os.path.join(self.data_path, 'products.csv'), customer=customer)
+
+        store.cart.reserve(store.products[0], 2)  # Member price $23.
+        store.cart.place_order('pickup')
+        self.assertEqual(customer.fund, '954.00')
+
+        store.cart.reserve(store.products[1], 20)
+        store.cart.reserve(store.products[2], 10)
+        store.cart.reserve(store.products[3], 15)  # 45 x $23 = $1035.
+        with self.assertRaises(InsufficientFundsError):
+            store.cart.place_order('pickup')
+        self.assertEqual(len(store.cart.items), 3)
+        self.assertEqual(customer.fund, '954.00')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import io
+import json
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestInstrumentation(unittest.TestCase):
+    """The unit tests for hot-path instrumentation"""
+
+    def setUp(self) -> None:
+        from monash_merchant.util import instrumentation
+        self.instrumentation = instrumentation
+        self.was_enabled = instrumentation.enabled
+        instrumentation.set_enabled(True)
+        instrumentation.reset()
+
+    def tearDown(self) -> None:
+        self.instrumentation.reset()
+        self.instrumentation.set_enabled(self.was_enabled)
+
+    def test_measure_records_calls_and_bytes(self) -> None:
+        """The unit test to check call counts, latencies and byte counters are summarised"""
+
+        for _ in range(3):
+            with self.instrumentation.measure('test.block'):
+                pass
+        self.instrumentation.record_bytes('test.block', read=10, written=4)
+
+        stats = self.instrumentation.summary()['test.block']
+        self.assertEqual(stats['calls'], 3)
+        self.assertEqual(stats['bytes_read'], 10)
+        self.assertEqual(stats['bytes_written'], 4)
+        self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+
+    def test_percentiles_use_nearest_rank_and_bounded_samples(self) -> None:
+        """The unit test to check percentiles pick the nearest-rank value and durations are sampled"""
+
+        for milliseconds in range(1, 103):
+            self.instrumentation.record('test.rank', milliseconds / 1000)
+        stats = self.instrumentation.summary()['test.rank']
+        self.assertAlmostEqual(stats['p50_ms'], 51)
+        self.assertAlmostEqual(stats['p99_ms'], 101)
+
+        for _ in range(self.instrumentation.MAX_SAMPLES + 10):
+            self.instrumentation.record('test.many', 0.001)
+        self.assertEqual(self.instrumentation.summary()['test.many']['calls'], self.instrumentation.MAX_SAMPLES + 10)
+        self.assertEqual(len(self.instrumentation._stats['test.many'].durations), self.instrumentation.MAX_SAMPLES)
+
+    def test_disabled_decorator_returns_function_unchanged(self) -> None:
+        """The unit test to check decorating while disabled adds no wrapper"""
+
+        self.instrumentation.set_enabled(False)
+
+        def func():
+            return 1
+
+        self.assertIs(self.instrumentation.instrumented('test.func')(func), func)
+        with self.instrumentation.measure('test.func'):
+            pass
+        self.assertEqual(self.instrumentation.summary(), {})
+
+    def test_json_report(self) -> None:
+        """The unit test to check the JSON report can be parsed back"""
+
+        self.instrumentation.record('test.report', 0.002)
+        stream = io.StringIO()
+        self.instrumentation.report(stream=stream, fmt='json')
+
+        self.assertEqual(json.loads(stream.getvalue())['test.report']['calls'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestLoadTest(unittest.TestCase):
+    """The unit tests for the load-test harness"""
+
+    def test_shared_store_stays_consistent(self) -> None:
+        """The unit test to check concurrent customers on a shared store neither oversell nor lose stock"""
+
+        from monash_merchant.load_test import LoadTest
+
+        results = LoadTest(os.path.join('..', 'data'), customers=4, admins=0, duration=0.5, seed=1).run()
+
+        self.assertGreater(results['counts'].get('orders', 0), 0)
+        self.assertEqual(results['errors'], {})
+        self.assertTrue(results['consistency']['ok'], results['consistency']['problems'])
+        self.assertEqual(results['consistency']['orders_journalled'], results['counts']['orders'])
+        self.assertIn('load_test.customer.checkout', results['latency'])
+        self.assertEqual(set(results['locks']), {'store', 'OrderJournal', 'FundLedger', 'fund_ledger.lock', 'StockLedger',
+                                                 'products.csv.lock'})
+
+    def test_store_per_session_with_low_stock_does_not_oversell(self) -> None:
+        """The unit test to check customers with stores of their own cannot sell more than the stock there is"""
+
+        from monash_merchant.load_test import LoadTest
+
+        results = LoadTest(os.path.join('..', 'data'), customers=6, admins=0, duration=0.5, stock=3,
+                           store_per_session=True, seed=1).run()
+
+        self.assertGreater(results['counts'].get('orders', 0), 0)
+        self.assertEqual(results['errors'], {})
+        self.assertTrue(results['consistency']['ok'], results['consistency']['problems'])
+        self.assertEqual(results['consistency']['orders_journalled'], results['counts']['orders'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestOrderJournal(unittest.TestCase):
+    """The unit tests for the append-only order journal"""
+
+    def setUp(self) -> None:
+        self.data_path = tempfile.mkdtemp()
+        self.journal_file = os.path.join(self.data_path, 'orders.jsonl')
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.data_path)
+
+    def test_concurrent_appends_replay(self) -> None:
+        """The unit test to check concurrent appends are all durable and replay to the stock taken"""
+
+        from monash_merchant.util.order_journal import OrderJournal
+
+        journal = OrderJournal.open(self.journal_file)
+        self.assertIs(OrderJournal.open(self.journal_file), journal)
+
+        def checkout() -> None:
+            for _ in range(10):
+                journal.append({'user_id': '1', 'lines': [{'product_id': 1, 'quantity': 2, 'price': 3.0}],
+                                'total': 6.0, 'fulfilment': 'pickup', 'address': None})
+
+        threads = [threading.Thread(target=checkout) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        journal.close()
+
+        records = list(journal.replay())
+        self.assertEqual(len(records), 80)
+        self.assertEqual(len({record['order_id'] for record in records}), 80)
+        self.assertEqual(journal.stock_decrements(), {1: 160})
+
+    def test_checkout_writes_order(self) -> None:
+        """The unit test to check Cart.place_order journals the customer, lines and address"""
+
+        from monash_merchant.cart_management import Store
+        from monash_merchant.model.user import User
+
+        for name in ['users.csv', 'customer.csv', 'products.csv']:
+            shutil.copy(os.path.join('..', 'data', name), self.data_path)
+        customer = User.login(email='member@student.monash.edu', password='Monash1234', data_path=self.data_path)
+        store = Store(filepath=os.path.join(self.data_path, 'products.csv'), customer=customer)
+        store.cart.reserve(store.products[0], 2)
+        store.cart.reserve(store.products[0], 1)
+
+        record = store.cart.place_order('delivery', '6 Main Street Pakenham')
+
+        self.assertEqual(record['user_id'], '1')
+        self.assertEqual(record['lines'][0]['quantity'], 3)
+        self.assertEqual(record['address'], '6 Main Street Pakenham')
+        self.assertEqual(store.journal.stock_decrements(), {1: 3})
+        self.assertEqual(store.cart.items, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
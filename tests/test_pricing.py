@@ -0,0 +1,80 @@
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestPricing(unittest.TestCase):
+    """The unit tests for the member-aware pricing engine"""
+
+    def setUp(self) -> None:
+        from monash_merchant.cart_management import Product
+        from monash_merchant.util.pricing import PriceBook
+
+        self.banana = Product(1, 'Banana', 'Cavendish', 'Fresh Banana', 0.1, 20, 0.07)
+        self.apple = Product(2, 'Apple', 'Royal Gala', 'Fresh Apple', 0.2, 20, float('nan'))
+        self.price_book = PriceBook([2, 1], [0.2, 0.1], [float('nan'), 0.07])
+
+    def test_quote_uses_member_prices_in_cents(self) -> None:
+        """The unit test to check member prices apply only to members and totals do not drift"""
+
+        items = [(self.banana, 3), (self.apple, 1), (self.banana, 7)]
+
+        retail = self.price_book.quote(items, member=False)
+        self.assertEqual([line['quantity'] for line in retail['lines']], [10, 1])
+        self.assertEqual(retail['total_cents'], 120)  # 10 x 0.1 + 0.2 summed in floats is 1.2000000000000002
+
+        member = self.price_book.quote(items, member=True)
+        self.assertEqual(member['lines'][0]['unit_cents'], 7)
+        self.assertEqual(member['lines'][1]['unit_cents'], 20)  # No member price for apples.
+        self.assertEqual(member['total_cents'], 90)
+
+    def test_quote_many(self) -> None:
+        """The unit test to check batch quoting of many carts"""
+
+        totals = self.price_book.quote_many(
+            cart_ids=[0, 0, 1, 2],
+            product_ids=[1, 2, 1, 2],
+            quantities=[10, 1, 10, 2],
+            members=[False, True, True])
+
+        self.assertEqual(totals.tolist(), [120, 70, 40])
+
+    def test_unknown_product(self) -> None:
+        """The unit test to check unknown product ids are rejected"""
+
+        with self.assertRaises(KeyError):
+            self.price_book.unit_prices([3], False)
+
+
+    def test_product_without_price(self) -> None:
+        """The unit test to check a product without a retail price is refused instead of priced at -1 cents"""
+
+        from monash_merchant.util.pricing import PriceBook
+
+        price_book = PriceBook([1, 2], [float('nan'), 2.5], [float('nan'), 2.3])
+        self.assertEqual(price_book.priced([1, 2]).tolist(), [False, True])
+        self.assertEqual(price_book.unit_prices([2], True).tolist(), [230])
+        with self.assertRaises(ValueError):
+            price_book.unit_prices([1, 2], False)
+
+    def test_empty_products_file_makes_an_empty_store(self) -> None:
+        """The unit test to check a products.csv that cannot be loaded gives an empty store, not a traceback"""
+
+        import os
+        import tempfile
+        from monash_merchant.cart_management import StockLedger, Store
+
+        with tempfile.TemporaryDirectory() as data_path:
+            products_file = os.path.join(data_path, 'products.csv')
+            open(products_file, mode='w').close()
+            try:
+                store = Store(filepath=products_file)
+            finally:
+                StockLedger._ledgers.pop(os.path.abspath(products_file), None)
+            self.assertEqual(store.products, [])
+            self.assertEqual(store.low_stock(), [])
+            self.assertEqual(store.cart.quote()['total_cents'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
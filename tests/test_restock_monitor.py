@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestRestockMonitor(unittest.TestCase):
+    """The unit tests for the low-stock heap"""
+
+    def test_queries_follow_updates(self) -> None:
+        """The unit test to check lowest and below-threshold queries after stock changes"""
+
+        from monash_merchant.util.restock_monitor import RestockMonitor
+
+        monitor = RestockMonitor(default_reorder_point=5)
+        monitor.update(1, 20)
+        monitor.update(2, 4)
+        monitor.update(3, 12, reorder_point=10)
+        monitor.update(4, 8)
+
+        self.assertEqual(monitor.below_threshold(), [(2, 4, 5)])
+        self.assertEqual(monitor.lowest(2), [(2, 4, 5), (3, 12, 10)])
+
+        monitor.update(2, 30)  # Restocked.
+        monitor.update(3, 9)  # Sold 3, keeps its own reorder point.
+        monitor.remove(4)
+        self.assertEqual(monitor.below_threshold(), [(3, 9, 10)])
+        self.assertEqual(monitor.lowest(10), [(3, 9, 10), (1, 20, 5), (2, 30, 5)])
+        self.assertEqual(len(monitor), 3)
+
+    def test_store_and_product_manager_keep_monitor_current(self) -> None:
+        """The unit test to check cart reservations and admin edits update the monitor"""
+
+        from monash_merchant.cart_management import Store
+        from monash_merchant.InventoryManagement.index import ProductManager
+
+        data_path = tempfile.mkdtemp()
+        try:
+            shutil.copy(os.path.join('..', 'data', 'products.csv'), data_path)
+            store = Store(filepath=os.path.join(data_path, 'products.csv'))
+            self.assertEqual(store.low_stock(), [])
+
+            product = next(p for p in store.products if p.id == 3)
+            store.cart.reserve(product, 6)
+            self.assertEqual([(p.id, quantity) for p, quantity, _ in store.low_stock()], [(3, 4)])
+            store.cart.clear()
+            self.assertEqual(store.low_stock(), [])
+
+            manager = ProductManager(data_path)
+            self.assertEqual(manager.low_stock_report(), [])
+            manager.set_product_field(4, 'product_quantity', '2')
+            for value in ['abc', '12.5']:
+                with self.assertRaises(ValueError):
+                    manager.set_product_field(4, 'product_quantity', value)
+            manager.add_product({'product_name': 'Milk', 'product_quantity': 1})
+            self.assertEqual([(product_id, quantity) for product_id, _, quantity, _ in manager.low_stock_report()],
+                             [(6, 1), (4, 2)])
+            manager.remove_product(6)
+            self.assertEqual([product_id for product_id, _, _, _ in manager.low_stock_report(n=2)], [4, 3])
+
+            manager.add_product({'product_name': 'Bread', 'product_quantity': ''})  # Quantity left blank.
+            store = Store(filepath=os.path.join(data_path, 'products.csv'))
+            self.assertEqual([p.id for p, _, _ in store.low_stock()], [4])
+        finally:
+            shutil.rmtree(data_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
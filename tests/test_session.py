@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestSession(unittest.TestCase):
+    """The unit tests for the login session and the recent-users cache"""
+
+    def setUp(self) -> None:
+        self.data_path = tempfile.mkdtemp()
+        for name in ['users.csv', 'customer.csv', 'products.csv']:
+            shutil.copy(os.path.join('..', 'data', name), self.data_path)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.data_path)
+
+    def test_recent_users(self) -> None:
+        """The unit test to check repeat logins are answered from the cache until the user files change"""
+
+        from monash_merchant.model.session import RecentUsers
+        recent_users = RecentUsers(capacity=1)
+        user = recent_users.login('member@student.monash.edu', 'Monash1234', self.data_path)
+        self.assertEqual(user.user_id, '1')
+        self.assertIs(recent_users.login('member@student.monash.edu', 'Monash1234', self.data_path), user)
+        self.assertIsNone(recent_users.login('member@student.monash.edu', 'wrong', self.data_path))
+
+        os.utime(os.path.join(self.data_path, 'customer.csv'), ns=(0, 0))
+        self.assertIsNot(recent_users.login('member@student.monash.edu', 'Monash1234', self.data_path), user)
+
+        recent_users.login('admin@merchant.monash.edu', '12345678', self.data_path)
+        self.assertEqual(len(recent_users), 1)  # The least recently used profile was dropped.
+
+    def test_session_keeps_store_and_cart(self) -> None:
+        """The unit test to check the store and cart are created once per login"""
+
+        from monash_merchant.model.session import RecentUsers, Session
+
+        user = RecentUsers().login('member@student.monash.edu', 'Monash1234', self.data_path)
+        session = Session(user, data_path=self.data_path)
+        store = session.store
+        self.assertIs(session.store, store)
+        self.assertIs(session.cart.customer, user)
+
+        product = store.products[0]
+        session.cart.reserve(product, 2)
+        self.assertIs(session.store.cart, session.cart)
+        self.assertEqual(len(session.cart.items), 1)
+
+        session.close()
+        self.assertEqual(product.quantity, 20)  # Unpaid stock went back to the store.
+
+    def test_session_store_follows_catalog_changes(self) -> None:
+        """The unit test to check an admin edit reaches a logged-in customer once their cart is empty"""
+
+        from monash_merchant.InventoryManagement.index import ProductManager
+        from monash_merchant.model.session import RecentUsers, Session
+
+        user = RecentUsers().login('member@student.monash.edu', 'Monash1234', self.data_path)
+        session = Session(user, data_path=self.data_path)
+        store = session.store
+        session.cart.reserve(store.products[0], 1)
+
+        ProductManager(self.data_path).set_product_field(5, 'product_price', '260')
+        self.assertIs(session.store, store)  # The cart still holds stock from this store.
+
+        session.cart.place_order('pickup')
+        self.assertIsNot(session.store, store)
+        self.assertEqual(session.store.products[4].price, 260)
+        self.assertIs(session.store, session.store)
+
+
+if __name__ == '__main__':
+    unittest.main()
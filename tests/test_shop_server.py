@@ -0,0 +1,101 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestShopServer(unittest.IsolatedAsyncioTestCase):
+    """The unit tests for the local JSON shop service"""
+
+    async def asyncSetUp(self) -> None:
+        from monash_merchant.shop_server import ShopServer
+
+        self.data_path = tempfile.mkdtemp()
+        for name in ['users.csv', 'customer.csv', 'products.csv']:
+            shutil.copy(os.path.join('..', 'data', name), self.data_path)
+        self.shop = ShopServer(data_path=self.data_path)
+        server = await self.shop.start()
+        self.port = server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self) -> None:
+        await self.shop.close()
+        shutil.rmtree(self.data_path)
+
+    async def _client(self):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+
+        async def call(**request):
+            writer.write(json.dumps(request).encode() + b'\n')
+            await writer.drain()
+            return json.loads(await reader.readline())
+
+        return call, writer
+
+    async def test_customer_checkout(self) -> None:
+        """The unit test to check a customer can log in, fill a cart and check out"""
+
+        import pandas as pd
+
+        call, writer = await self._client()
+        self.assertFalse((await call(op='add_to_cart', product_id=1, quantity=1))['ok'])
+        self.assertTrue((await call(op='login', email='member@student.monash.edu', password='Monash1234'))['ok'])
+
+        response = await call(op='add_to_cart', product_id=1, quantity=3)
+        self.assertEqual(response['cart']['lines'][0]['quantity'], 3)
+        self.assertFalse((await call(op='add_to_cart', product_id=1, quantity=1000))['ok'])
+
+        response = await call(op='checkout', fulfilment='delivery', address='6 Main Street Pakenham')
+        self.assertTrue(response['ok'])
+        self.assertEqual((await call(op='view_cart'))['cart']['lines'], [])
+        writer.close()
+
+        stock = self.shop.store.stock.load()
+        self.assertEqual(stock.loc[stock['product_id'] == 1, 'product_quantity'].iloc[0], 17)
+        products = pd.read_csv(os.path.join(self.data_path, 'products.csv'))
+        self.assertEqual(products.loc[products['product_id'] == 1, 'product_quantity'].iloc[0], 20)  # Not yet compacted.
+        self.shop.store.stock.compact()
+        products = pd.read_csv(os.path.join(self.data_path, 'products.csv'))
+        self.assertEqual(products.loc[products['product_id'] == 1, 'product_quantity'].iloc[0], 17)
+
+    async def test_journal_failure_keeps_the_cart(self) -> None:
+        """The unit test to check a failed journal write is reported to the customer, who keeps the cart"""
+
+        def append_many(records):
+            raise OSError('No space left on device')
+
+        call, writer = await self._client()
+        await call(op='login', email='member@student.monash.edu', password='Monash1234')
+        await call(op='add_to_cart', product_id=1, quantity=2)
+        self.shop.store.journal.append_many = append_many
+        try:
+            response = await call(op='checkout')
+        finally:
+            del self.shop.store.journal.append_many
+        self.assertFalse(response['ok'])
+        self.assertIn('No space left on device', response['error'])
+        self.assertEqual((await call(op='view_cart'))['cart']['lines'][0]['quantity'], 2)
+        writer.close()
+
+    async def test_concurrent_sessions_share_stock(self) -> None:
+        """The unit test to check concurrent shoppers cannot take more stock than available"""
+
+        clients = [await self._client() for _ in range(5)]
+        for call, _ in clients:
+            await call(op='login', email='member@student.monash.edu', password='Monash1234')
+
+        responses = await asyncio.gather(*[call(op='add_to_cart', product_id=3, quantity=3) for call, _ in clients])
+        self.assertEqual(sum(response['ok'] for response in responses), 3)  # Only 10 mangoes in stock.
+
+        results = await asyncio.gather(*[call(op='checkout') for call, _ in clients])
+        self.assertEqual(sum(result['ok'] for result in results), 3)
+        self.assertEqual(self.shop.products[3].quantity, 1)
+        for _, writer in clients:
+            writer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
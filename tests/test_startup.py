@@ -0,0 +1,33 @@
+import os
+import subprocess
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestStartup(unittest.TestCase):
+    """The unit tests for start-up imports"""
+
+    def test_main_does_not_import_pandas(self) -> None:
+        """The unit test to check pandas and numpy are only loaded on first product access"""
+
+        result = subprocess.run(
+            [sys.executable, '-c', 'import sys, main; print("pandas" in sys.modules, "numpy" in sys.modules)'],
+            cwd=os.path.join('..'), capture_output=True, text=True, check=True)
+
+        self.assertEqual(result.stdout.strip(), 'False False')
+
+    def test_load_pandas(self) -> None:
+        """The unit test to check the lazy loader returns the pandas module"""
+
+        from monash_merchant.util.lazy_pandas import load_pandas, preload_pandas
+
+        thread = preload_pandas()
+        if thread is not None:
+            thread.join()
+        self.assertEqual(load_pandas().__name__, 'pandas')
+        self.assertIsNone(preload_pandas())
+
+
+if __name__ == '__main__':
+    unittest.main()
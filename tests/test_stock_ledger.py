@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+import sys
+sys.path.append('..')
+
+
+class TestStockLedger(unittest.TestCase):
+    """The unit tests for stock derived from the order journal"""
+
+    def setUp(self) -> None:
+        self.data_path = tempfile.mkdtemp()
+        for name in ['users.csv', 'customer.csv', 'products.csv']:
+            shutil.copy(os.path.join('..', 'data', name), self.data_path)
+        self.products_file = os.path.join(self.data_path, 'products.csv')
+
+    def tearDown(self) -> None:
+        from monash_merchant.cart_management import StockLedger
+        StockLedger._ledgers.pop(os.path.abspath(self.products_file), None)
+        shutil.rmtree(self.data_path)
+
+    def test_checkouts_keep_admin_edits(self) -> None:
+        """The unit test to check a store loaded before an admin edit neither reverts it nor loses other sales"""
+
+        import pandas as pd
+        from monash_merchant.cart_management import Store
+        from monash_merchant.InventoryManagement.index import ProductManager
+
+        first, second = Store(filepath=self.products_file), Store(filepath=self.products_file)
+        first.cart.reserve(first.products[0], 2)
+        first.cart.place_order('pickup')
+
+        manager = ProductManager(self.data_path)
+        manager.set_product_field(2, 'product_price', '400')
+        manager.add_product({'product_name': 'Milk', 'product_quantity': 4})
+        second.cart.reserve(second.products[0], 3)
+        second.cart.place_order('pickup')
+
+        self.assertEqual(Store(filepath=self.products_file).products[0].quantity, 15)
+        second.stock.compact()
+        products = pd.read_csv(self.products_file).set_index('product_id')
+        self.assertEqual(products.loc[1, 'product_quantity'], 15)
+        self.assertEqual(products.loc[2, 'product_price'], 400)
+        self.assertEqual(products.loc[6, 'product_name'], 'Milk')
+
+    def test_two_stores_cannot_oversell(self) -> None:
+        """The unit test to check stock sold by one store is refused to another store loaded before the sale"""
+
+        from monash_merchant.cart_management import OutOfStockError, Store
+
+        first, second = Store(filepath=self.products_file), Store(filepath=self.products_file)
+        first.cart.reserve(first.products[0], 20)
+        second.cart.reserve(second.products[0], 20)
+        first.cart.place_order('pickup')
+        with self.assertRaises(OutOfStockError):
+            second.cart.place_order('pickup')
+
+        self.assertEqual(len(second.cart.items), 1)  # The cart is kept.
+        self.assertEqual(first.stock.load()['product_quantity'].iloc[0], 0)
+
+    def test_compaction_every_n_orders(self) -> None:
+        """The unit test to check products.csv is only rewritten once compact_every orders are journalled"""
+
+        import pandas as pd
+        from monash_merchant.cart_management import Store
+
+        store = Store(filepath=self.products_file)
+        store.stock.compact_every = 3
+        for expected in [20, 20, 17]:
+            store.cart.reserve(store.products[0], 1)
+            store.cart.place_order('pickup')
+            self.assertEqual(pd.read_csv(self.products_file)['product_quantity'].iloc[0], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,318 @@
+import contextlib
+import gzip
+import io
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from util.file_lock import FileLock
+from util.instrumentation import measure, record_bytes
+from util.lazy_pandas import load_pandas
+
+# The history of e.g. data/products.csv lives in data/products.csv.history/
+HISTORY_SUFFIX = '.history'
+DELTAS_NAME = 'deltas.jsonl'
+CHECKPOINTS_NAME = 'checkpoints.json'
+LOCK_NAME = 'history.lock'
+
+# A full compressed copy of the table is kept after this many deltas.
+CHECKPOINT_EVERY = 100
+
+KEY_COLUMN = 'product_id'
+
+
+def history_dir(csv_path) -> str:
+    """
+    Get the history directory belonging to a csv file.
+    :param csv_path: Path to the csv file.
+    :return: Path to the history directory.
+    """
+    return os.fspath(csv_path) + HISTORY_SUFFIX
+
+
+def _parse(data: bytes):
+    """Parse csv bytes keeping every value exactly as written, as checkpoints and deltas store them."""
+    pd = load_pandas()
+    return pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False)
+
+
+def _text(value) -> str:
+    """Write a cell the way DataFrame.to_csv writes it: missing values empty, everything else as str()."""
+    return '' if load_pandas().isna(value) else str(value)
+
+
+class CatalogHistory(object):
+    """
+    The save history of a product table: one delta per save holding only the cells of the product_ids
+    that changed, added and removed products, plus a gzip-compressed full copy every checkpoint_every deltas
+    (and whenever the columns or their types change). as_of() rebuilds the table at any past moment from the
+    latest checkpoint before it and the deltas after that checkpoint.
+    Deltas are found by comparing the DataFrame being saved with the one saved before, column by column.
+    Saves hold a file lock in the history directory and first re-read what other processes recorded.
+    """
+
+    _histories: Dict[str, 'CatalogHistory'] = {}
+    _histories_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, csv_path) -> 'CatalogHistory':
+        """
+        Get the history of a csv file, shared by everyone in this process saving it.
+        :param csv_path: Path to the csv file, example: data/products.csv.
+        :return: The CatalogHistory.
+        """
+        key = os.path.abspath(csv_path)
+        with cls._histories_lock:
+            history = cls._histories.get(key)
+            if history is None:
+                history = cls._histories[key] = cls(csv_path)
+            return history
+
+    def __init__(self, csv_path, checkpoint_every: int = CHECKPOINT_EVERY) -> None:
+        """
+        The __init__ method for CatalogHistory. Prefer CatalogHistory.open() so that saves share one history.
+        :param csv_path: Path to the csv file.
+        :param checkpoint_every: (Optional) Number of deltas after which a full checkpoint is written.
+        """
+        self.csv_path = os.fspath(csv_path)
+        self.directory = history_dir(csv_path)
+        self.checkpoint_every = checkpoint_every
+        self._deltas_path = os.path.join(self.directory, DELTAS_NAME)
+        self._checkpoints_path = os.path.join(self.directory, CHECKPOINTS_NAME)
+        self._lock = threading.RLock()
+        self._previous = None  # The table as last saved, indexed by product_id.
+        self._previous_stat = None  # The size and mtime of the csv file holding _previous.
+        # Read from the history directory under its file lock on every save, as other processes may have added to it.
+        self._checkpoints: List[Dict] = []
+        self._seq = self._deltas_since_checkpoint = 0
+        # The size and mtime of the csv file after the last recorded save, to notice edits made elsewhere.
+        self._recorded_stat = None
+
+    @contextlib.contextmanager
+    def saving(self, df, data: bytes):
+        """
+        Record a save of the csv file, example: with history.saving(df, data): <write data to the csv file>.
+        Saves of the same file are serialised, across processes too, so that each delta follows the one before it.
+        :param df: The DataFrame being saved.
+        :param data: Its csv bytes, as about to be written.
+        :return: A context manager; the save is recorded when the block completes without error.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, FileLock.open(os.path.join(self.directory, LOCK_NAME)):
+            # Pick up the checkpoints and deltas other processes recorded since this one last saved.
+            self._checkpoints = self._read_checkpoints()
+            self._seq, self._deltas_since_checkpoint = self._scan_deltas()
+            self._before_write()
+            yield
+            self._record(df, data, time.time())
+
+    def _before_write(self) -> None:
+        """
+        Make sure the table currently on disk is known, so that the save can be diffed against it.
+        A table without history, or one edited since the last recorded save, gets a checkpoint first.
+        """
+        from util.catalog_snapshot import read_products  # Imported here, catalog_snapshot imports this module.
+
+        try:
+            stat = os.stat(self.csv_path)
+        except FileNotFoundError:
+            return
+        if self._previous is not None and self._previous_stat == [stat.st_size, stat.st_mtime_ns]:
+            return
+        if self._recorded_stat != [stat.st_size, stat.st_mtime_ns]:
+            with open(self.csv_path, mode='rb') as file:
+                self._checkpoint(file.read(), stat.st_mtime_ns / 1e9, stat)
+        self._set_previous(read_products(self.csv_path), stat)
+
+    def _record(self, df, data: bytes, timestamp: float) -> None:
+        with measure('CatalogHistory.record'):
+            stat = os.stat(self.csv_path)
+            previous = self._previous
+            if (previous is None or not df[KEY_COLUMN].is_unique
+                    or list(df.columns) != [KEY_COLUMN] + list(previous.columns)
+                    or list(df.dtypes) != [previous.index.dtype] + list(previous.dtypes)
+                    or self._deltas_since_checkpoint >= self.checkpoint_every):
+                self._checkpoint(data, timestamp, stat)
+            else:
+                delta = self._diff(previous, df.set_index(KEY_COLUMN))
+                if delta['changed'] or delta['removed']:
+                    self._append_delta(delta, timestamp, stat)
+            self._recorded_stat = [stat.st_size, stat.st_mtime_ns]
+            self._set_previous(df, stat)
+
+    def as_of(self, timestamp: float):
+        """
+        Rebuild the table as it was saved at the given moment. Roll back with write_products(as_of(t), path).
+        :param timestamp: The moment, as seconds since the epoch.
+        :return: A DataFrame equal to pandas.read_csv() of the csv file at that moment.
+        """
+        pd = load_pandas()
+        with self._lock, measure('CatalogHistory.as_of'):
+            self._checkpoints = self._read_checkpoints()
+            checkpoints = [checkpoint for checkpoint in self._checkpoints if checkpoint['timestamp'] <= timestamp]
+            if not checkpoints:
+                raise KeyError(f'No history of {self.csv_path} before {timestamp}.')
+            checkpoint = checkpoints[-1]
+            with open(os.path.join(self.directory, checkpoint['file']), mode='rb') as file:
+                table = _parse(gzip.decompress(file.read()))
+            deltas = self._read_deltas(checkpoint['offset'], checkpoint['seq'], timestamp)
+
+        if deltas:
+            table = self._apply(table, deltas)
+        return pd.read_csv(io.StringIO(table.to_csv(index=False)))
+
+    def timestamps(self) -> List[Tuple[int, float]]:
+        """
+        List the recorded saves.
+        :return: A list of (sequence number, timestamp) pairs of the checkpoints and deltas, oldest first.
+        """
+        with self._lock:
+            self._checkpoints = self._read_checkpoints()
+            saves = {checkpoint['seq']: checkpoint['timestamp'] for checkpoint in self._checkpoints}
+            first = self._checkpoints[0] if self._checkpoints else None
+            if first is not None:
+                saves.update((delta['seq'], delta['timestamp'])
+                             for delta in self._read_deltas(first['offset'], first['seq'], float('inf')))
+            return sorted(saves.items())
+
+    @staticmethod
+    def _diff(previous, current) -> Dict:
+        """Compare two tables indexed by product_id, with the same columns and types, one whole column at a time."""
+        if current.index.equals(previous.index):
+            common = current.index  # The usual case: same products in the same order, only values changed.
+            before, after = previous, current
+        else:
+            common = current.index.intersection(previous.index)
+            before, after = previous.loc[common], current.loc[common]
+
+        pd = load_pandas()
+        changed: Dict[str, Dict[str, str]] = {}
+        for name in current.columns:
+            if after[name].equals(before[name]):
+                continue  # Most saves change a column or two; equals() checks a whole column without Python loops.
+            old, new = before[name].to_numpy(), after[name].to_numpy()
+            rows = (old != new).nonzero()[0]
+            rows = rows[~(pd.isna(old[rows]) & pd.isna(new[rows]))]  # NaN != NaN, but two missing values are equal.
+            for row in rows.tolist():
+                changed.setdefault(_text(common[row]), {})[name] = _text(new[row])
+        for product_id, values in current.loc[current.index.difference(previous.index)].iterrows():
+            changed[_text(product_id)] = {name: _text(value) for name, value in values.items()}  # Stored in full.
+        return {'changed': changed, 'removed': [_text(product_id)
+                                                for product_id in previous.index.difference(current.index)]}
+
+    @staticmethod
+    def _apply(table, deltas: List[Dict]):
+        """Fold the deltas into the latest value per cell, then write those into the table once."""
+        pd = load_pandas()
+        changed: Dict[str, Dict[str, str]] = {}
+        removed = set()
+        for delta in deltas:
+            for product_id in delta['removed']:
+                changed.pop(product_id, None)
+                removed.add(product_id)
+            for product_id, values in delta['changed'].items():
+                changed.setdefault(product_id, {}).update(values)
+                removed.discard(product_id)
+
+        order = list(table.columns)
+        table = table.set_index(KEY_COLUMN)
+        positions = table.index.get_indexer(list(changed))
+        existing = [(position, values) for position, values in zip(positions, changed.values()) if position >= 0]
+        columns = {name: table[name].to_numpy(dtype=object, copy=True) for name in table.columns}
+        for position, values in existing:
+            for name, value in values.items():
+                columns[name][position] = value
+        table = pd.DataFrame(columns, index=table.index)
+
+        added = [dict(values, **{KEY_COLUMN: product_id})
+                 for (product_id, values), position in zip(changed.items(), positions) if position < 0]
+        table = table[~table.index.isin(removed)].reset_index()
+        if added:
+            table = pd.concat([table, pd.DataFrame(added, columns=table.columns)], ignore_index=True)
+        return table[order]
+
+    def _set_previous(self, table, stat: os.stat_result) -> None:
+        # A copy, so that later changes to the caller's DataFrame do not leak into the next diff.
+        self._previous = table.set_index(KEY_COLUMN).copy() if table[KEY_COLUMN].is_unique else None
+        self._previous_stat = [stat.st_size, stat.st_mtime_ns]
+
+    def _checkpoint(self, data: bytes, timestamp: float, stat: os.stat_result) -> None:
+        """
+        Write a compressed full copy of the table and start a new run of deltas after it. Called under the history
+        file lock with the checkpoint list just re-read, so entries written by other processes are kept.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._seq += 1
+        filename = f'checkpoint-{self._seq:012d}.csv.gz'
+        with measure('CatalogHistory.checkpoint'):
+            compressed = gzip.compress(data, compresslevel=6)
+            _write_atomic(os.path.join(self.directory, filename), compressed)
+        record_bytes('CatalogHistory.checkpoint', written=len(compressed))
+        offset = os.path.getsize(self._deltas_path) if os.path.exists(self._deltas_path) else 0
+        self._checkpoints.append({'seq': self._seq, 'timestamp': timestamp, 'file': filename, 'offset': offset,
+                                  'csv_stat': [stat.st_size, stat.st_mtime_ns]})
+        _write_atomic(self._checkpoints_path, json.dumps(self._checkpoints).encode())
+        self._deltas_since_checkpoint = 0
+        self._recorded_stat = [stat.st_size, stat.st_mtime_ns]
+
+    def _append_delta(self, delta: Dict, timestamp: float, stat: os.stat_result) -> None:
+        self._seq += 1
+        line = json.dumps({'seq': self._seq, 'timestamp': timestamp, 'csv_stat': [stat.st_size, stat.st_mtime_ns],
+                           **delta}).encode() + b'\n'
+        with open(self._deltas_path, mode='ab') as file:
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        record_bytes('CatalogHistory.record', written=len(line))
+        self._deltas_since_checkpoint += 1
+
+    def _read_deltas(self, offset: int, after_seq: int, until: float) -> List[Dict]:
+        """Read the deltas after a checkpoint up to a moment, skipping a torn last line."""
+        deltas = []
+        if not os.path.exists(self._deltas_path):
+            return deltas
+        with open(self._deltas_path, mode='rb') as file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                delta = json.loads(line)
+                if delta['timestamp'] > until:
+                    break
+                if delta['seq'] > after_seq:
+                    deltas.append(delta)
+        return deltas
+
+    def _read_checkpoints(self) -> List[Dict]:
+        try:
+            with open(self._checkpoints_path, mode='r') as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def _scan_deltas(self) -> Tuple[int, int]:
+        """Find the last sequence number and the number of deltas since the last checkpoint, under the file lock."""
+        if not self._checkpoints:
+            return 0, 0
+        last = self._checkpoints[-1]
+        deltas = self._read_deltas(last['offset'], last['seq'], float('inf'))
+        self._recorded_stat = (deltas[-1] if deltas else last)['csv_stat']
+        if os.path.exists(self._deltas_path):
+            with open(self._deltas_path, mode='rb+') as file:
+                file.seek(0, os.SEEK_END)
+                if file.tell() and (file.seek(-1, os.SEEK_END), file.read(1))[1] != b'\n':
+                    # Drop a torn last line left by a crash during a write, so new deltas start on a line of their own.
+                    file.seek(0)
+                    file.truncate(file.read().rfind(b'\n') + 1)
+        return (deltas[-1]['seq'] if deltas else last['seq']), len(deltas)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    temp_path = path + '.tmp'
+    with open(temp_path, mode='wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
@@ -0,0 +1,248 @@
+import contextlib
+import hashlib
+import io
+import json
+import os
+import uuid
+from typing import Dict, List
+
+from util.catalog_history import CatalogHistory
+from util.chunked_csv import PARALLEL_THRESHOLD, PRODUCT_DTYPES, read_csv_parallel
+from util.instrumentation import measure, record_file_read, record_file_write
+from util.lazy_pandas import load_pandas
+
+# The binary snapshot of e.g. data/products.csv lives in data/products.csv.snapshot/
+SNAPSHOT_SUFFIX = '.snapshot'
+MANIFEST_NAME = 'manifest.json'
+SNAPSHOT_VERSION = 1
+
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+def snapshot_dir(csv_path) -> str:
+    """
+    Get the snapshot directory belonging to a csv file.
+    :param csv_path: Path to the csv file.
+    :return: Path to the snapshot directory.
+    """
+    return os.fspath(csv_path) + SNAPSHOT_SUFFIX
+
+
+def read_products(csv_path):
+    """
+    Load a product table, memory-mapping the binary snapshot when it matches the csv file
+    and otherwise parsing the csv file (in parallel chunks when it is large) and (re)writing the snapshot.
+    :param csv_path: Path to the csv file.
+    :return: A DataFrame equal to pandas.read_csv(csv_path, dtype=PRODUCT_DTYPES), whatever the size of the file.
+    """
+    csv_path = os.fspath(csv_path)
+    manifest = _read_manifest(csv_path)
+    # Everything below works from one open file, so that the size, mtime, hash and table written to the
+    # manifest all describe the same version of the csv file even if it is replaced meanwhile.
+    with open(csv_path, mode='rb') as file:
+        stat = os.fstat(file.fileno())
+        if manifest is not None and _matches(csv_path, file, stat, manifest):
+            df = _load_snapshot(csv_path, manifest)
+            if df is not None:
+                return df
+
+        if stat.st_size > PARALLEL_THRESHOLD:
+            csv_hash = _hash_file(file)
+            # The workers open the file by name; only cache the result if that is still the file hashed here.
+            df = read_csv_parallel(csv_path, dtype=PRODUCT_DTYPES)
+            current = os.stat(csv_path)
+            if (current.st_ino, current.st_size, current.st_mtime_ns) != (stat.st_ino, stat.st_size, stat.st_mtime_ns):
+                csv_hash = None
+        else:
+            data = file.read()
+            csv_hash = hashlib.sha256(data).hexdigest()
+            pd = load_pandas()
+            with measure('pandas.read_csv'):
+                df = pd.read_csv(io.BytesIO(data), dtype=PRODUCT_DTYPES)
+    record_file_read('catalog_snapshot.read_products', csv_path)
+    if csv_hash is not None:
+        _write_snapshot(csv_path, df, stat, csv_hash)
+    return df
+
+def write_products(df, csv_path) -> None:
+    """
+    Save a product table to its csv file, record the change in its history and keep the binary snapshot in sync.
+    The csv file is replaced atomically, so concurrent readers see either the old or the new table.
+    The snapshot is written straight from the DataFrame when the column types are unchanged,
+    otherwise it is dropped and rebuilt from the csv file on the next read.
+    :param df: The product DataFrame.
+    :param csv_path: Path to the csv file.
+    :return: None
+    """
+    csv_path = os.fspath(csv_path)
+    previous = _read_manifest(csv_path)
+
+    with measure('pandas.to_csv'):
+        data = df.to_csv(index=False).encode()
+    with CatalogHistory.open(csv_path).saving(df, data):
+        _replace_file(csv_path, data)
+    record_file_write('catalog_snapshot.write_products', csv_path)
+
+    if previous is not None and _column_types(df) == [(c['name'], c['dtype']) for c in previous['columns']]:
+        _write_snapshot(csv_path, df, os.stat(csv_path), hashlib.sha256(data).hexdigest())
+    else:
+        invalidate(csv_path)
+
+
+def invalidate(csv_path) -> None:
+    """
+    Remove the snapshot manifest so that the next read parses the csv file.
+    :param csv_path: Path to the csv file.
+    :return: None
+    """
+    try:
+        os.remove(os.path.join(snapshot_dir(csv_path), MANIFEST_NAME))
+    except FileNotFoundError:
+        pass
+
+
+def _replace_file(path: str, data: bytes) -> None:
+    """Write to a temporary file next to path, flush it to disk and move it over path."""
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        with open(temp_path, mode='wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp_path)
+        raise
+
+
+def _hash_file(file) -> str:
+    """Hash an open binary file from its start, leaving it positioned at the start again."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for block in iter(lambda: file.read(_HASH_BLOCK_SIZE), b''):
+        digest.update(block)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def _read_manifest(csv_path: str) -> Dict | None:
+    try:
+        with open(os.path.join(snapshot_dir(csv_path), MANIFEST_NAME), mode='r') as file:
+            manifest = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        return None
+    return manifest
+
+
+def _write_manifest(csv_path: str, manifest: Dict) -> None:
+    path = os.path.join(snapshot_dir(csv_path), MANIFEST_NAME)
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(temp_path, mode='w') as file:
+        json.dump(manifest, file)
+    os.replace(temp_path, path)
+
+
+def _matches(csv_path: str, file, stat: os.stat_result, manifest: Dict) -> bool:
+    """
+    Check the snapshot against the csv mtime, falling back to the content hash if only the mtime moved.
+    file is the csv file, open, and stat its os.fstat().
+    """
+    if stat.st_size != manifest['csv_size']:
+        return False
+    if stat.st_mtime_ns == manifest['csv_mtime_ns']:
+        return True
+    if _hash_file(file) != manifest['csv_sha256']:
+        return False
+    manifest['csv_mtime_ns'] = stat.st_mtime_ns
+    _write_manifest(csv_path, manifest)
+    return True
+
+
+def _column_kind(series) -> str | None:
+    import numpy as np
+    pd = load_pandas()
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biuf':
+        return 'numeric'
+    if pd.api.types.is_string_dtype(series.dtype) and \
+            pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return 'string'
+    return None
+
+
+def _column_types(df) -> List[tuple]:
+    return [(str(name), str(dtype)) for name, dtype in df.dtypes.items()]
+
+
+def _write_snapshot(csv_path: str, df, stat: os.stat_result, csv_hash: str) -> None:
+    """Write one .npy file per column, then atomically publish a manifest pointing at them."""
+    import numpy as np
+
+    directory = snapshot_dir(csv_path)
+    generation = uuid.uuid4().hex[:12]
+    columns = []
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for index, (name, dtype) in enumerate(_column_types(df)):
+            series = df.iloc[:, index]
+            kind = _column_kind(series)
+            if kind is None:
+                invalidate(csv_path)
+                return
+            column = {'name': name, 'dtype': dtype, 'kind': kind, 'file': f'{generation}-{index}.npy'}
+            if kind == 'numeric':
+                np.save(os.path.join(directory, column['file']), series.to_numpy())
+            else:
+                missing = series.isna().to_numpy()
+                values = np.asarray(series.fillna('').to_numpy(dtype=object), dtype=str)
+                np.save(os.path.join(directory, column['file']), values)
+                if missing.any():
+                    column['missing'] = f'{generation}-{index}.na.npy'
+                    np.save(os.path.join(directory, column['missing']), missing)
+            columns.append(column)
+
+        _write_manifest(csv_path, {
+            'version': SNAPSHOT_VERSION,
+            'csv_mtime_ns': stat.st_mtime_ns,
+            'csv_size': stat.st_size,
+            'csv_sha256': csv_hash,
+            'rows': len(df),
+            'columns': columns,
+        })
+    except OSError:
+        # The snapshot is only a cache; a read-only data directory simply means csv parsing every time.
+        return
+
+    # Remove files of previous generations. Processes still mapping them keep their pages.
+    for filename in os.listdir(directory):
+        if filename.endswith('.npy') and not filename.startswith(generation):
+            try:
+                os.remove(os.path.join(directory, filename))
+            except OSError:
+                pass
+
+
+def _load_snapshot(csv_path: str, manifest: Dict):
+    """Build the DataFrame from the memory-mapped column files, or None if any file is missing."""
+    import numpy as np
+    pd = load_pandas()
+
+    directory = snapshot_dir(csv_path)
+    data = {}
+    with measure('catalog_snapshot.load'):
+        try:
+            for column in manifest['columns']:
+                # Copy-on-write mapping: pages are shared between processes until a value is changed.
+                values = np.load(os.path.join(directory, column['file']), mmap_mode='c')
+                if column['kind'] == 'numeric':
+                    data[column['name']] = pd.Series(values.view(np.ndarray), dtype=column['dtype'], copy=False)
+                else:
+                    values = values.astype(object)
+                    if 'missing' in column:
+                        values[np.load(os.path.join(directory, column['missing']))] = np.nan
+                    data[column['name']] = pd.Series(values, dtype=column['dtype'])
+        except (FileNotFoundError, ValueError):
+            return None
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,136 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+from util.instrumentation import measure, record_bytes
+from util.lazy_pandas import load_pandas
+
+# Files larger than this are parsed in parallel by read_csv_parallel.
+PARALLEL_THRESHOLD = 64 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 32 * 1024 * 1024
+
+# Declared dtypes for the products table. Text columns must be declared: inferred per chunk, a column
+# that happens to hold only numbers (or nothing) in one chunk would be concatenated with the text of
+# another into a mixed object column. The numeric columns that may be blank (prices, quantity, is_active)
+# are left to inference, since int64 and float64 chunks reconcile to float64.
+PRODUCT_DTYPES = {
+    'product_id': 'int64',
+    'product_name': 'str',
+    'product_brand': 'str',
+    'product_description': 'str',
+    'product_category': 'str',
+    'product_sub_category': 'str',
+    'product_expiry': 'str',
+    'product_ingridients': 'str',
+    'product_storage_instructions': 'str',
+    'product_allergens': 'str',
+}
+
+def read_header(path) -> Tuple[List[str], int]:
+    """
+    Read the header line of a csv file.
+    Note: the chunked readers assume records do not contain quoted line breaks.
+    :param path: Path to the csv file.
+    :return: The column names and the byte offset where the data starts.
+    """
+    with open(path, mode='rb') as file:
+        line = file.readline()
+    pd = load_pandas()
+    names = list(pd.read_csv(io.BytesIO(line), nrows=0).columns)
+    return names, len(line)
+
+
+def split_byte_ranges(path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Tuple[int, int]]:
+    """
+    Split the data part of a csv file into byte ranges ending on line boundaries.
+    :param path: Path to the csv file.
+    :param chunk_size: Approximate size of each range in bytes.
+    :return: A list of (start, end) offsets covering all data lines.
+    """
+    if chunk_size <= 0:
+        raise ValueError("Argument 'chunk_size' must be positive.")
+    _, start = read_header(path)
+    size = os.path.getsize(path)
+
+    ranges = []
+    with open(path, mode='rb') as file:
+        while start < size:
+            end = start + chunk_size
+            if end >= size:
+                end = size
+            else:
+                file.seek(end)
+                file.readline()  # Move to the end of the line containing the cut.
+                end = min(file.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _parse_range(path, start: int, end: int, names: List[str], dtype: Dict[str, str] | None):
+    """Parse one byte range of a csv file. Runs in a worker process."""
+    pd = load_pandas()
+    with open(path, mode='rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    return pd.read_csv(io.BytesIO(data), header=None, names=names, dtype=dtype)
+
+
+def iter_csv_chunks(path, dtype: Dict[str, str] | None = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator:
+    """
+    Stream a csv file as DataFrames of about chunk_size bytes each, for consumers
+    that do not need the whole table in memory.
+    :param path: Path to the csv file.
+    :param dtype: (Optional) Declared column dtypes, example: PRODUCT_DTYPES.
+    :param chunk_size: Approximate size of each chunk in bytes.
+    :return: An iterator of DataFrames with a continuous index.
+    """
+    names, _ = read_header(path)
+    offset = 0
+    for start, end in split_byte_ranges(path, chunk_size):
+        chunk = _parse_range(path, start, end, names, _declared(dtype, names))
+        chunk.index += offset
+        offset += len(chunk)
+        record_bytes('chunked_csv.iter_csv_chunks', read=end - start)
+        yield chunk
+
+
+def read_csv_parallel(path, dtype: Dict[str, str] | None = None,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int | None = None):
+    """
+    Parse a large csv file by splitting it into line-aligned byte ranges and parsing them in a process pool.
+    Every parsed chunk is kept until they are concatenated, so peak memory is about twice the resulting DataFrame;
+    use iter_csv_chunks() when the whole table is not needed at once.
+    :param path: Path to the csv file.
+    :param dtype: (Optional) Declared column dtypes, example: PRODUCT_DTYPES.
+    :param chunk_size: Approximate size of each range in bytes.
+    :param workers: (Optional) Number of worker processes, defaults to the number of CPUs.
+    :return: The DataFrame for the whole file.
+    """
+    pd = load_pandas()
+    names, _ = read_header(path)
+    dtype = _declared(dtype, names)
+    ranges = split_byte_ranges(path, chunk_size)
+
+    with measure('chunked_csv.read_csv_parallel'):
+        if len(ranges) <= 1 or workers == 1:
+            chunks = [_parse_range(path, start, end, names, dtype) for start, end in ranges]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_parse_range, path, start, end, names, dtype) for start, end in ranges]
+                chunks = [future.result() for future in futures]
+    record_bytes('chunked_csv.read_csv_parallel', read=os.path.getsize(path))
+
+    if not chunks:
+        return pd.read_csv(path, dtype=dtype)
+    # A chunk where an undeclared optional column is empty parses it as float NaN; let pandas re-infer those columns.
+    return pd.concat(chunks, ignore_index=True).infer_objects()
+
+
+def _declared(dtype: Dict[str, str] | None, names: List[str]) -> Dict[str, str] | None:
+    """Keep only declared dtypes for columns present in the file."""
+    if dtype is None:
+        return None
+    return {name: value for name, value in dtype.items() if name in names}
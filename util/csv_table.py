@@ -1,6 +1,8 @@
 import os
 import csv
-from typing import Dict, List
+from typing import Callable, Dict, List
+
+from util.instrumentation import instrumented, record_file_read, record_file_write
 
 
 class CsvTable(object):
@@ -35,6 +37,7 @@ class CsvTable(object):
                 writer = csv.writer(file)
                 writer.writerow(column_names)
 
+    @instrumented('CsvTable.select')
     def select(self, where: Dict[str, str]) -> List[Dict[str, str]]:
         """
         Provide a simple 'select' method for the table.
@@ -57,6 +60,8 @@ class CsvTable(object):
                 if all(stripped_row[key] == value for key, value in where.items()):
                     matching_rows.append(stripped_row)
 
+        record_file_read('CsvTable.select', self._filename)
+
         # Return the filtered result
         return matching_rows
 
@@ -67,7 +72,63 @@ class CsvTable(object):
         :param where: A dict describing rows to select, example: {'role': 'user', 'username': 'test_user'}.
         :return: None
         """
-        raise NotImplementedError('This method is not yet required for the current features.')
+
+        # Validate provided argument type
+        if not isinstance(values, dict):
+            raise TypeError("Argument 'values' must be a dict.")
+        if not isinstance(where, dict):
+            raise TypeError("Argument 'where' must be a dict.")
+
+        def update_row(row: Dict[str, str]) -> None:
+            if all(row[key] == value for key, value in where.items()):
+                row.update(values)
+
+        self._rewrite(update_row)
+
+    def update_many(self, key: str, values_by_key: Dict[str, Dict[str, str]]) -> None:
+        """
+        Update many rows with different values in a single rewrite of the file.
+        :param key: The column identifying rows, example: 'user_id'.
+        :param values_by_key: A dict from key value to the values to update, example {'1': {'fund': '900.00'}}.
+        :return: None
+        """
+
+        # Validate provided argument type
+        if not isinstance(key, str):
+            raise TypeError("Argument 'key' must be a str.")
+        if not isinstance(values_by_key, dict):
+            raise TypeError("Argument 'values_by_key' must be a dict.")
+
+        def update_row(row: Dict[str, str]) -> None:
+            if row[key] in values_by_key:
+                row.update(values_by_key[row[key]])
+
+        self._rewrite(update_row)
+
+    @instrumented('CsvTable.rewrite')
+    def _rewrite(self, update_row: Callable[[Dict[str, str]], None]) -> None:
+        """
+        Rewrite the csv file, passing every row through update_row. The file is replaced atomically.
+        :param update_row: A function modifying a row dict in place.
+        :return: None
+        """
+        with open(self._filename, mode='r', newline='') as file:
+            reader = csv.DictReader(file)
+            column_names = [name.strip() for name in reader.fieldnames or []]
+            rows = [{key.strip(): value.strip() for key, value in row.items()} for row in reader]
+
+        for row in rows:
+            update_row(row)
+
+        temp_filename = self._filename + '.tmp'
+        with open(temp_filename, mode='w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=column_names)
+            writer.writeheader()
+            writer.writerows(rows)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_filename, self._filename)
+        record_file_write('CsvTable.rewrite', self._filename)
 
     def insert(self, values: Dict[str, str]) -> None:
         """
@@ -0,0 +1,130 @@
+import bisect
+import datetime
+from typing import Dict, List, Tuple
+
+# Expiry dates are entered free-form; these formats are tried in order (day first, as in '12-03-05').
+EXPIRY_FORMATS = ['%d-%m-%y', '%d-%m-%Y', '%Y-%m-%d', '%d/%m/%y', '%d/%m/%Y']
+
+
+def parse_expiry(value) -> datetime.date | None:
+    """
+    Parse a product_expiry value.
+    :param value: The value from the products table, example: '12-03-05'.
+    :return: The expiry date, or None if the value is empty or not a date.
+    """
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    for fmt in EXPIRY_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class ExpiryIndex(object):
+    """
+    Products ordered by expiry date, maintained incrementally, for range queries such as
+    'expiring in the next N days' in O(log n + k).
+    """
+
+    def __init__(self) -> None:
+        """
+        The __init__ method for ExpiryIndex.
+        """
+        self._entries: List[Tuple[datetime.date, int]] = []  # Sorted (expiry, product_id) pairs.
+        self._expiry: Dict[int, datetime.date] = {}
+
+    @classmethod
+    def from_dataframe(cls, df) -> 'ExpiryIndex':
+        """
+        Build the index from a products DataFrame, parsing every expiry date once.
+        :param df: DataFrame with product_id and product_expiry columns.
+        :return: The ExpiryIndex.
+        """
+        index = cls()
+        if 'product_expiry' not in df.columns:
+            return index
+        values = df['product_expiry'].tolist()
+        parsed = {value: parse_expiry(value) for value in set(values)}  # Few distinct dates, many products.
+        for product_id, value in zip(df['product_id'].tolist(), values):
+            expiry = parsed[value]
+            if expiry is not None:
+                index._expiry[int(product_id)] = expiry
+        index._entries = sorted((expiry, product_id) for product_id, expiry in index._expiry.items())
+        return index
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def set(self, product_id: int, value) -> None:
+        """
+        Add or update the expiry date of a product. Products without a valid date are left out of the index.
+        :param product_id: The product id.
+        :param value: The new product_expiry value.
+        :return: None
+        """
+        self.remove(product_id)
+        expiry = parse_expiry(value)
+        if expiry is not None:
+            self._expiry[int(product_id)] = expiry
+            bisect.insort(self._entries, (expiry, int(product_id)))
+
+    def remove(self, product_id: int) -> None:
+        """
+        Remove a product from the index.
+        :param product_id: The product id.
+        :return: None
+        """
+        expiry = self._expiry.pop(int(product_id), None)
+        if expiry is not None:
+            position = bisect.bisect_left(self._entries, (expiry, int(product_id)))
+            del self._entries[position]
+
+    def expiry_of(self, product_id: int) -> datetime.date | None:
+        """
+        Get the expiry date of a product.
+        :param product_id: The product id.
+        :return: The expiry date, or None if the product has none.
+        """
+        return self._expiry.get(int(product_id))
+
+    def between(self, start: datetime.date, end: datetime.date) -> List[Tuple[datetime.date, int]]:
+        """
+        Find products expiring from start up to and including end.
+        :param start: The first date of the range.
+        :param end: The last date of the range.
+        :return: A list of (expiry, product_id) pairs ordered by expiry.
+        """
+        low = bisect.bisect_left(self._entries, (start,))
+        high = bisect.bisect_left(self._entries, (end + datetime.timedelta(days=1),))
+        return self._entries[low:high]
+
+    def expired(self, today: datetime.date | None = None) -> List[Tuple[datetime.date, int]]:
+        """
+        Find products whose expiry date has passed.
+        :param today: (Optional) The current date, defaults to today.
+        :return: A list of (expiry, product_id) pairs ordered by expiry.
+        """
+        today = today or datetime.date.today()
+        return self._entries[:bisect.bisect_left(self._entries, (today,))]
+
+    def expiring_within(self, days: int, today: datetime.date | None = None) -> List[Tuple[datetime.date, int]]:
+        """
+        Find products expiring today or in the next given number of days.
+        :param days: The number of days to look ahead.
+        :param today: (Optional) The current date, defaults to today.
+        :return: A list of (expiry, product_id) pairs ordered by expiry.
+        """
+        today = today or datetime.date.today()
+        return self.between(today, today + datetime.timedelta(days=days))
+
+    def report(self, days: int, today: datetime.date | None = None) -> Dict[str, List[Tuple[datetime.date, int]]]:
+        """
+        The daily perishables sweep: expired products to remove and soon-to-expire products to mark down.
+        :param days: The markdown window in days.
+        :param today: (Optional) The current date, defaults to today.
+        :return: A dict with 'remove' and 'markdown' lists of (expiry, product_id) pairs.
+        """
+        return {'remove': self.expired(today), 'markdown': self.expiring_within(days, today)}
@@ -0,0 +1,124 @@
+import contextlib
+import os
+import threading
+from typing import Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are serialised.
+    fcntl = None
+
+
+class FileLock(object):
+    """
+    A lock shared by the threads of this process and, through flock() on a lock file, by other processes.
+    Held exclusively (with FileLock.open(path): ...) it is re-entrant, so that a thread holding it can call other
+    code that takes it again. shared() holds it for reading: any number of readers, in this process and others,
+    hold it at the same time, while an exclusive holder waits for them and keeps new readers out.
+    """
+
+    _locks: Dict[str, 'FileLock'] = {}
+    _locks_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path) -> 'FileLock':
+        """
+        Get the lock for a lock file, shared by everyone in this process.
+        :param path: Path to the lock file, example: data/products.csv.lock. It is created if missing.
+        :return: The FileLock.
+        """
+        key = os.path.abspath(path)
+        with cls._locks_lock:
+            lock = cls._locks.get(key)
+            if lock is None:
+                lock = cls._locks[key] = cls(key)
+            return lock
+
+    def __init__(self, path: str) -> None:
+        """
+        The __init__ method for FileLock. Prefer FileLock.open() so that threads share one lock.
+        :param path: Path to the lock file.
+        """
+        self.path = path
+        self._lock = threading.RLock()  # Held by the exclusive holder, and briefly by readers arriving.
+        self._depth = 0
+        self._file = None
+        self._owner = None  # The thread holding the lock exclusively.
+        self._readers = 0  # Threads of this process holding the lock shared.
+        self._shared_file = None  # The file all of them hold the shared flock() through.
+        self._readers_changed = threading.Condition()
+        self._local = threading.local()
+
+    def acquire(self) -> None:
+        if getattr(self._local, 'shared', 0):
+            raise RuntimeError(f'{self.path} is held shared by this thread and cannot be upgraded.')
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                with self._readers_changed:
+                    while self._readers:
+                        self._readers_changed.wait()
+                self._file = _locked_file(self.path, exclusive=True)
+            except BaseException:
+                self._lock.release()
+                raise
+            self._owner = threading.get_ident()
+        self._depth += 1
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self._owner = None
+            self._file.close()  # Closing the file releases the flock.
+            self._file = None
+        self._lock.release()
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+    @contextlib.contextmanager
+    def shared(self):
+        """
+        Hold the lock for reading, example: with lock.shared(): <read the files it guards>.
+        A thread holding the lock exclusively simply takes it again.
+        :return: A context manager.
+        """
+        if self._owner == threading.get_ident():
+            with self:
+                yield
+            return
+        held = getattr(self._local, 'shared', 0)
+        if not held:
+            with self._lock:  # Wait for an exclusive holder in this process.
+                with self._readers_changed:
+                    if not self._readers:
+                        self._shared_file = _locked_file(self.path, exclusive=False)
+                    self._readers += 1
+        self._local.shared = held + 1
+        try:
+            yield
+        finally:
+            self._local.shared -= 1
+            if not self._local.shared:
+                with self._readers_changed:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._shared_file.close()
+                        self._shared_file = None
+                        self._readers_changed.notify_all()
+
+
+def _locked_file(path: str, exclusive: bool):
+    """Open a lock file and flock() it."""
+    file = open(path, mode='a')
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    except BaseException:
+        file.close()
+        raise
+    return file
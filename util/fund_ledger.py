@@ -0,0 +1,275 @@
+import csv
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from util.csv_table import CsvTable
+from util.file_lock import FileLock
+from util.instrumentation import measure
+
+LEDGER_COLUMNS = ['entry_id', 'timestamp', 'user_id', 'amount_cents', 'reference']
+
+# The ledger is folded back into customer.csv after this many entries.
+COMPACT_EVERY = 1000
+
+
+class InsufficientFundsError(ValueError):
+    """Raised when a debit is larger than the customer's balance."""
+
+
+def _to_cents(dollars: str) -> int:
+    try:
+        return int(round(float(dollars) * 100))
+    except ValueError:
+        return 0
+
+
+class FundLedger(object):
+    """
+    Customer funds as an append-only log of debits and credits on top of the 'fund' column of customer.csv.
+    Balances are kept in memory so payment checks are O(1); a debit appends one line to the ledger file
+    instead of rewriting customer.csv. compact() folds the ledger back into customer.csv, which happens
+    automatically every compact_every entries.
+    Debits, credits and compaction hold a file lock shared with other processes, and first apply the entries
+    other processes appended since (or reload, if one of them compacted), so a balance cannot be spent twice.
+    """
+
+    _ledgers: Dict[str, 'FundLedger'] = {}
+    _ledgers_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, data_path: str = 'data') -> 'FundLedger':
+        """
+        Get the ledger for a data directory, shared by everyone in this process.
+        :param data_path: The path to the directory containing customer.csv.
+        :return: The FundLedger.
+        """
+        key = os.path.abspath(data_path)
+        with cls._ledgers_lock:
+            ledger = cls._ledgers.get(key)
+            if ledger is None:
+                ledger = cls._ledgers[key] = cls(data_path)
+            return ledger
+
+    def __init__(self, data_path: str = 'data', compact_every: int = COMPACT_EVERY) -> None:
+        """
+        The __init__ method for FundLedger. Prefer FundLedger.open() so that all debits share one balance index.
+        Finishes an interrupted compaction, then builds the balance index from customer.csv and the ledger.
+        :param data_path: The path to the directory containing customer.csv.
+        :param compact_every: (Optional) Number of ledger entries after which the ledger is compacted.
+        """
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._customer_table = CsvTable(
+            name='customer',
+            column_names=['user_id', 'first_name', 'last_name', 'date_of_birth',
+                          'gender', 'mobile_number', 'address', 'fund', 'membership'],
+            data_path=data_path
+        )
+        self._ledger_filename = os.path.join(data_path, 'fund_ledger.csv')
+        self._checkpoint_filename = os.path.join(data_path, 'fund_ledger.checkpoint.json')
+        self._file_lock = FileLock.open(os.path.join(data_path, 'fund_ledger.lock'))
+        with self._file_lock:
+            self._load()
+
+    def _load(self) -> None:
+        """
+        Finish an interrupted compaction, then build the balance index from customer.csv and the ledger.
+        Called with the file lock held.
+        """
+        # The checkpoint records which ledger entries customer.csv already includes.
+        checkpoint = self._read_checkpoint()
+        if checkpoint['pending'] is not None:
+            self._customer_table.update_many('user_id', self._fund_values(checkpoint['pending']))
+            checkpoint['pending'] = None
+            self._write_checkpoint(checkpoint)
+        self._applied_through = checkpoint['applied_through']
+
+        with measure('FundLedger.load'):
+            self._balances: Dict[str, int] = {
+                row['user_id']: _to_cents(row['fund']) for row in self._customer_table.select(where={})}
+            self._last_entry_id = self._applied_through
+            self._touched: set = set()
+            entries, torn = self._read_entries()
+            for entry in entries:
+                self._last_entry_id = max(self._last_entry_id, int(entry['entry_id']))
+                if int(entry['entry_id']) > self._applied_through:
+                    self._apply(entry['user_id'], int(entry['amount_cents']))
+
+        if torn or not os.path.exists(self._ledger_filename):
+            # Drop a torn last line left by a crash during a write, so that new entries stay readable.
+            self._reset_ledger_file(entries)
+        self._file = open(self._ledger_filename, mode='a', newline='')
+        self._read_offset = os.fstat(self._file.fileno()).st_size  # Bytes of the ledger file already applied.
+
+    def balance(self, user_id: str) -> int:
+        """
+        Get a customer's current balance, including entries appended by other processes.
+        :param user_id: The customer's user_id.
+        :return: The balance in cents.
+        """
+        with self._file_lock, self._lock:
+            self._catch_up()
+            return self._balances.get(user_id, 0)
+
+    def debit(self, user_id: str, amount_cents: int, reference: str = '') -> int:
+        """
+        Atomically check the balance and take an amount from it.
+        :param user_id: The customer's user_id.
+        :param amount_cents: The amount to take, in cents.
+        :param reference: (Optional) What the debit is for, example: an order id.
+        :return: The new balance in cents.
+        """
+        if amount_cents < 0:
+            raise ValueError("Argument 'amount_cents' must not be negative.")
+        with self._file_lock, self._lock:
+            self._catch_up()
+            balance = self._balances.get(user_id, 0)
+            if amount_cents > balance:
+                raise InsufficientFundsError(
+                    f'Insufficient funds: balance ${balance / 100:.2f}, required ${amount_cents / 100:.2f}.')
+            balance = self._post(user_id, -amount_cents, reference)
+            self._compact_if_due()
+            return balance
+
+    def credit(self, user_id: str, amount_cents: int, reference: str = '') -> int:
+        """
+        Add an amount to a customer's balance, example: a top-up or a refund.
+        :param user_id: The customer's user_id.
+        :param amount_cents: The amount to add, in cents.
+        :param reference: (Optional) What the credit is for.
+        :return: The new balance in cents.
+        """
+        if amount_cents < 0:
+            raise ValueError("Argument 'amount_cents' must not be negative.")
+        with self._file_lock, self._lock:
+            self._catch_up()
+            balance = self._post(user_id, amount_cents, reference)
+            self._compact_if_due()
+            return balance
+
+    def compact(self) -> int:
+        """
+        Fold the ledger into the 'fund' column of customer.csv with one rewrite, then empty the ledger.
+        Safe against crashes: the balances to write are checkpointed first and re-applied on the next start.
+        :return: The number of customers whose fund was rewritten.
+        """
+        with self._file_lock, self._lock:
+            self._catch_up()
+            if self._last_entry_id == self._applied_through:
+                return 0
+            pending = {user_id: self._balances[user_id] for user_id in self._touched}
+            checkpoint = {'applied_through': self._last_entry_id, 'pending': pending}
+            self._write_checkpoint(checkpoint)
+
+            self._customer_table.update_many('user_id', self._fund_values(pending))
+            checkpoint['pending'] = None
+            self._write_checkpoint(checkpoint)
+
+            self._file.close()
+            self._reset_ledger_file()
+            self._file = open(self._ledger_filename, mode='a', newline='')
+            self._read_offset = os.fstat(self._file.fileno()).st_size
+            self._applied_through = self._last_entry_id
+            self._touched = set()
+            return len(pending)
+
+    def _compact_if_due(self) -> None:
+        if self._last_entry_id - self._applied_through >= self.compact_every:
+            self.compact()
+
+    def close(self) -> None:
+        """
+        Close the ledger file.
+        :return: None
+        """
+        with self._lock:
+            self._file.close()
+
+    def _catch_up(self) -> None:
+        """
+        Apply the entries other processes appended since the last operation, or reload everything if another
+        process compacted the ledger (replacing the file this one appends to). Called with both locks held.
+        """
+        try:
+            stat = os.stat(self._ledger_filename)
+        except FileNotFoundError:
+            stat = None
+        if stat is None or stat.st_ino != os.fstat(self._file.fileno()).st_ino:
+            self._file.close()
+            self._load()
+            return
+        if stat.st_size == self._read_offset:
+            return
+        with open(self._ledger_filename, mode='rb') as file:
+            file.seek(self._read_offset)
+            data = file.read(stat.st_size - self._read_offset)
+        complete = data.rfind(b'\n') + 1
+        for row in csv.reader(data[:complete].decode().splitlines()):
+            entry_id = int(row[0])
+            if entry_id > self._last_entry_id:
+                self._last_entry_id = entry_id
+                self._apply(row[2], int(row[3]))
+        self._read_offset += complete
+
+    def _post(self, user_id: str, amount_cents: int, reference: str) -> int:
+        """Append one entry and fsync it, then update the balance index. Called with both locks held."""
+        entry_id = self._last_entry_id + 1
+        with measure('FundLedger.post'):
+            csv.writer(self._file).writerow([entry_id, f'{time.time():.6f}', user_id, amount_cents, reference])
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._read_offset = os.fstat(self._file.fileno()).st_size
+        self._last_entry_id = entry_id
+        return self._apply(user_id, amount_cents)
+
+    def _apply(self, user_id: str, amount_cents: int) -> int:
+        balance = self._balances[user_id] = self._balances.get(user_id, 0) + amount_cents
+        self._touched.add(user_id)
+        return balance
+
+    def _read_entries(self) -> Tuple[List[Dict[str, str]], bool]:
+        """Read the ledger entries, and whether the file ends in a torn (partially written) line."""
+        if not os.path.exists(self._ledger_filename):
+            return [], False
+        entries = []
+        with open(self._ledger_filename, mode='r', newline='') as file:
+            data = file.read()
+        for row in csv.DictReader(data.splitlines()):
+            try:
+                int(row['entry_id']), int(row['amount_cents'])
+            except (TypeError, ValueError):
+                return entries, True
+            entries.append(row)
+        return entries, bool(data) and not data.endswith('\n')
+
+    def _reset_ledger_file(self, entries: List[Dict[str, str]] | None = None) -> None:
+        temp_filename = self._ledger_filename + '.tmp'
+        with open(temp_filename, mode='w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=LEDGER_COLUMNS)
+            writer.writeheader()
+            writer.writerows(entries or [])
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_filename, self._ledger_filename)
+
+    def _read_checkpoint(self) -> Dict:
+        try:
+            with open(self._checkpoint_filename, mode='r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {'applied_through': 0, 'pending': None}
+
+    def _write_checkpoint(self, checkpoint: Dict) -> None:
+        temp_filename = self._checkpoint_filename + '.tmp'
+        with open(temp_filename, mode='w') as file:
+            json.dump(checkpoint, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_filename, self._checkpoint_filename)
+
+    @staticmethod
+    def _fund_values(balances: Dict[str, int]) -> Dict[str, Dict[str, str]]:
+        return {user_id: {'fund': f'{cents / 100:.2f}'} for user_id, cents in balances.items()}
@@ -0,0 +1,270 @@
+import atexit
+import functools
+import math
+import os
+import random
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, TextIO
+
+# Set MONASH_MERCHANT_PROFILE=1 (or =table) to print a timing table at exit, =json for a JSON dump.
+ENV_VAR = 'MONASH_MERCHANT_PROFILE'
+
+_mode = os.environ.get(ENV_VAR, '').strip().lower()
+enabled = _mode not in ('', '0', 'false', 'no', 'off')
+
+# Percentiles are computed from a uniform random sample of at most this many durations per name.
+MAX_SAMPLES = 10000
+
+_lock = threading.Lock()
+_random = random.Random()
+
+
+class _Stat(object):
+    """
+    The accumulated measurements for one instrumented name. Calls, total and maximum are exact; the
+    durations kept for percentiles are a reservoir sample, so memory stays bounded however long it runs.
+    """
+
+    __slots__ = ('calls', 'total', 'maximum', 'durations', 'bytes_read', 'bytes_written')
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.durations: List[float] = []
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def add(self, seconds: float) -> None:
+        self.calls += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+        if len(self.durations) < MAX_SAMPLES:
+            self.durations.append(seconds)
+        else:
+            index = _random.randrange(self.calls)  # Keep each of the calls so far with equal probability.
+            if index < MAX_SAMPLES:
+                self.durations[index] = seconds
+
+
+_stats: Dict[str, _Stat] = {}
+
+
+def _stat(name: str) -> _Stat:
+    stat = _stats.get(name)
+    if stat is None:
+        stat = _stats.setdefault(name, _Stat())
+    return stat
+
+
+def set_enabled(flag: bool) -> None:
+    """
+    Switch recording on or off at runtime.
+    Functions decorated with @instrumented while disabled stay unwrapped.
+    :param flag: True to record measurements.
+    :return: None
+    """
+    global enabled
+    enabled = flag
+
+
+def record(name: str, seconds: float) -> None:
+    """
+    Record one call of the given name taking the given time.
+    :param name: The instrumented name, example: 'CsvTable.select'.
+    :param seconds: The duration of the call.
+    :return: None
+    """
+    if not enabled:
+        return
+    with _lock:
+        _stat(name).add(seconds)
+
+
+def record_bytes(name: str, read: int = 0, written: int = 0) -> None:
+    """
+    Record bytes read or written on behalf of the given name.
+    :param name: The instrumented name.
+    :param read: Number of bytes read.
+    :param written: Number of bytes written.
+    :return: None
+    """
+    if not enabled:
+        return
+    with _lock:
+        stat = _stat(name)
+        stat.bytes_read += read
+        stat.bytes_written += written
+
+
+def record_file_read(name: str, path) -> None:
+    """
+    Record the size of a file that was read in full. Does not touch the file system when disabled.
+    :param name: The instrumented name.
+    :param path: Path of the file that was read.
+    :return: None
+    """
+    if enabled:
+        record_bytes(name, read=_file_size(path))
+
+
+def record_file_write(name: str, path) -> None:
+    """
+    Record the size of a file that was written in full. Does not touch the file system when disabled.
+    :param name: The instrumented name.
+    :param path: Path of the file that was written.
+    :return: None
+    """
+    if enabled:
+        record_bytes(name, written=_file_size(path))
+
+
+def _file_size(path) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class _Timer(object):
+    """Context manager timing the enclosed block."""
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> '_Timer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        record(self.name, time.perf_counter() - self.start)
+
+
+class _NullTimer(object):
+    """Context manager doing nothing, used while instrumentation is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullTimer':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def measure(name: str) -> _Timer | _NullTimer:
+    """
+    Time a block of code, example: with measure('pandas.read_csv'): ...
+    :param name: The instrumented name.
+    :return: A context manager.
+    """
+    if not enabled:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def instrumented(name: str | None = None) -> Callable[[Callable], Callable]:
+    """
+    Decorator timing every call of the decorated function.
+    When instrumentation is disabled at import time the function is returned unchanged.
+    :param name: (Optional) The instrumented name, defaults to the function's qualified name.
+    :return: The decorator.
+    """
+    def decorator(func: Callable) -> Callable:
+        if not enabled:
+            return func
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(label, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summary() -> Dict[str, Dict[str, float]]:
+    """
+    Summarise all measurements recorded so far.
+    :return: A dict keyed by instrumented name, each value holding calls, total, mean and percentile
+             latencies in milliseconds as well as bytes read and written.
+    """
+    with _lock:
+        items = [(name, stat.calls, stat.total, stat.maximum, list(stat.durations), stat.bytes_read,
+                  stat.bytes_written) for name, stat in _stats.items()]
+
+    result = {}
+    for name, calls, total, maximum, durations, bytes_read, bytes_written in sorted(items):
+        durations.sort()
+        result[name] = {
+            'calls': calls,
+            'total_ms': total * 1000,
+            'mean_ms': total * 1000 / calls if calls else 0.0,
+            'p50_ms': _percentile(durations, 0.50) * 1000,
+            'p95_ms': _percentile(durations, 0.95) * 1000,
+            'p99_ms': _percentile(durations, 0.99) * 1000,
+            'max_ms': maximum * 1000,
+            'bytes_read': bytes_read,
+            'bytes_written': bytes_written,
+        }
+    return result
+
+
+def reset() -> None:
+    """
+    Discard all measurements recorded so far.
+    :return: None
+    """
+    with _lock:
+        _stats.clear()
+
+
+def report(stream: TextIO | None = None, fmt: str | None = None) -> None:
+    """
+    Write the summary as a table, or as JSON when fmt (or the environment variable) is 'json'.
+    :param stream: (Optional) The stream to write to, defaults to stderr.
+    :param fmt: (Optional) Either 'table' or 'json'.
+    :return: None
+    """
+    stream = stream if stream is not None else sys.stderr
+    fmt = fmt or ('json' if _mode == 'json' else 'table')
+    stats = summary()
+
+    if fmt == 'json':
+        import json
+        json.dump(stats, stream, indent=2)
+        stream.write('\n')
+        return
+
+    header = (f"{'name':<36} {'calls':>7} {'total ms':>10} {'p50 ms':>9} {'p95 ms':>9} "
+              f"{'p99 ms':>9} {'read B':>12} {'written B':>12}")
+    lines = ['', header, '-' * len(header)]
+    for name, stat in stats.items():
+        lines.append(f"{name:<36} {stat['calls']:>7} {stat['total_ms']:>10.2f} {stat['p50_ms']:>9.3f} "
+                     f"{stat['p95_ms']:>9.3f} {stat['p99_ms']:>9.3f} {stat['bytes_read']:>12} "
+                     f"{stat['bytes_written']:>12}")
+    stream.write('\n'.join(lines) + '\n')
+
+
+if enabled:
+    atexit.register(report)
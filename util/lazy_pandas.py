@@ -0,0 +1,35 @@
+import threading
+from types import ModuleType
+
+from util.instrumentation import measure
+
+_pandas: ModuleType | None = None
+_lock = threading.Lock()
+
+
+def load_pandas() -> ModuleType:
+    """
+    Import pandas on first use so that start-up (login screen, admin sessions) does not pay for it.
+    The import time is recorded under 'import pandas' when instrumentation is enabled.
+    :return: The pandas module.
+    """
+    global _pandas
+    if _pandas is None:
+        with _lock:
+            if _pandas is None:
+                with measure('import pandas'):
+                    import pandas
+                _pandas = pandas
+    return _pandas
+
+
+def preload_pandas() -> threading.Thread | None:
+    """
+    Start importing pandas on a background thread, example: right after a customer logs in.
+    :return: The started thread, or None if pandas is already loaded.
+    """
+    if _pandas is not None:
+        return None
+    thread = threading.Thread(target=load_pandas, name='preload-pandas', daemon=True)
+    thread.start()
+    return thread
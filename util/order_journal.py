@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List, Tuple
+
+from util.instrumentation import measure, record_bytes
+
+
+def _json_default(value):
+    """Serialise numpy scalars (as found in DataFrame rows) as plain Python values."""
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class OrderJournal(object):
+    """
+    An append-only journal of orders, one JSON record per line.
+    Concurrent appends are group committed: whichever caller finds no write in progress writes every
+    pending record and fsyncs once for the whole batch, the others wait for that batch to become durable.
+    """
+
+    _journals: Dict[str, 'OrderJournal'] = {}
+    _journals_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path: str) -> 'OrderJournal':
+        """
+        Get the journal for a file, shared by everyone in this process appending to it.
+        :param path: Path to the journal file, example: data/orders.jsonl.
+        :return: The OrderJournal.
+        """
+        key = os.path.abspath(path)
+        with cls._journals_lock:
+            journal = cls._journals.get(key)
+            if journal is None:
+                journal = cls._journals[key] = cls(path)
+            return journal
+
+    def __init__(self, path: str) -> None:
+        """
+        The __init__ method for OrderJournal. Prefer OrderJournal.open() so that appends share one batch.
+        :param path: Path to the journal file.
+        """
+        self.path = path
+        self._file = None
+        self._cond = threading.Condition()
+        self._pending: List[bytes] = []
+        self._next_seq = 0  # Sequence number of the last record handed to append.
+        self._durable_seq = 0  # Sequence number of the last record fsynced.
+        self._flushing = False
+        self._failures: List[tuple] = []
+
+    def append(self, record: Dict) -> Dict:
+        """
+        Append one order record and wait until it is durable.
+        :param record: The order, example: {'user_id': '1', 'lines': [...], 'total': 7.0, 'fulfilment': 'pickup'}.
+        :return: The record as written, with 'order_id' and 'timestamp' filled in.
+        """
+        return self.append_many([record])[0]
+
+    def append_many(self, records: List[Dict]) -> List[Dict]:
+        """
+        Append several order records and wait until all of them are durable.
+        :param records: The orders to append.
+        :return: The records as written, with 'order_id' and 'timestamp' filled in.
+        """
+        if not records:
+            return []
+        written = []
+        lines = []
+        for record in records:
+            record = {'order_id': uuid.uuid4().hex, 'timestamp': time.time(), **record}
+            written.append(record)
+            lines.append(json.dumps(record, default=_json_default).encode() + b'\n')
+
+        with self._cond:
+            self._pending.extend(lines)
+            self._next_seq += len(lines)
+            my_seq = self._next_seq
+            while self._durable_seq < my_seq:
+                self._raise_if_failed(my_seq)
+                if self._flushing:
+                    self._cond.wait()
+                    continue
+                self._flush_pending()
+            self._raise_if_failed(my_seq)
+        return written
+
+    def _flush_pending(self) -> None:
+        """Write and fsync everything pending. Called with the condition held; releases it during I/O."""
+        batch, self._pending = self._pending, []
+        first_seq, last_seq = self._durable_seq + 1, self._next_seq
+        self._flushing = True
+        self._cond.release()
+        error = None
+        try:
+            data = b''.join(batch)
+            with measure('OrderJournal.group_commit'):
+                if self._file is None:
+                    self._file = open(self.path, mode='ab')
+                self._file.write(data)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            record_bytes('OrderJournal.group_commit', written=len(data))
+        except OSError as e:
+            error = e
+        finally:
+            self._cond.acquire()
+            self._flushing = False
+            if error is not None:
+                self._failures.append((first_seq, last_seq, error))
+            self._durable_seq = last_seq
+            self._cond.notify_all()
+
+    def _raise_if_failed(self, seq: int) -> None:
+        for first_seq, last_seq, error in self._failures:
+            if first_seq <= seq <= last_seq:
+                raise OSError(f'Order journal write failed: {error}') from error
+
+    def replay(self) -> Iterator[Dict]:
+        """
+        Read back every durable order record in the order they were written.
+        A torn last line left by a crash during a write is ignored.
+        :return: An iterator of order records.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, mode='rb') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    if line.endswith(b'\n'):
+                        raise
+                    return
+
+    def read_from(self, offset: int = 0) -> Tuple[List[Dict], int]:
+        """
+        Read the complete records written after a byte offset, for readers following the journal as it grows.
+        :param offset: Where to start, 0 or an offset returned by an earlier call.
+        :return: The records, and the offset just after the last complete record.
+        """
+        try:
+            with open(self.path, mode='rb') as file:
+                file.seek(offset)
+                data = file.read()
+        except FileNotFoundError:
+            return [], offset
+        complete = data.rfind(b'\n') + 1  # Leave a torn or still-being-written last line for next time.
+        record_bytes('OrderJournal.read_from', read=len(data))
+        return [json.loads(line) for line in data[:complete].splitlines()], offset + complete
+
+    def stock_decrements(self) -> Dict[int, int]:
+        """
+        Derive the stock taken by all journalled orders.
+        :return: A dict of product_id to the total quantity ordered.
+        """
+        decrements: Dict[int, int] = {}
+        for record in self.replay():
+            for line in record['lines']:
+                decrements[line['product_id']] = decrements.get(line['product_id'], 0) + line['quantity']
+        return decrements
+
+    def close(self) -> None:
+        """
+        Close the journal file. It is reopened on the next append.
+        :return: None
+        """
+        with self._cond:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
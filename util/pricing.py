@@ -0,0 +1,132 @@
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+def to_cents(values) -> np.ndarray:
+    """
+    Convert dollar amounts to integer cents, rounding to the nearest cent.
+    :param values: A sequence of dollar amounts. Missing values (NaN) become -1.
+    :return: An int64 array of cents.
+    """
+    dollars = np.asarray(values, dtype=float)
+    cents = np.full(dollars.shape, -1, dtype=np.int64)
+    present = ~np.isnan(dollars)
+    cents[present] = np.rint(dollars[present] * 100).astype(np.int64)
+    return cents
+
+
+class PriceBook(object):
+    """Retail and member prices in integer cents, looked up by product id with vectorised gathers."""
+
+    def __init__(self, product_ids: Sequence[int], prices: Sequence[float],
+                 member_prices: Sequence[float] | None = None) -> None:
+        """
+        The __init__ method for PriceBook.
+        :param product_ids: The product ids. Expected to be unique.
+        :param prices: The retail price of each product in dollars.
+        :param member_prices: (Optional) The member price of each product in dollars, NaN if there is none.
+        """
+        ids = np.asarray(product_ids, dtype=np.int64)
+        order = np.argsort(ids, kind='stable')
+        self._ids = ids[order]
+        if len(self._ids) > 1 and (self._ids[1:] == self._ids[:-1]).any():
+            raise ValueError("Argument 'product_ids' must be unique.")
+
+        self._price_cents = to_cents(prices)[order]
+        if member_prices is None:
+            member_cents = np.full(len(ids), -1, dtype=np.int64)
+        else:
+            member_cents = to_cents(member_prices)[order]
+        # A member pays the member price when there is one, but never more than the retail price.
+        self._member_cents = np.where(member_cents >= 0, np.minimum(member_cents, self._price_cents),
+                                      self._price_cents)
+
+    @classmethod
+    def from_dataframe(cls, df) -> 'PriceBook':
+        """
+        Build a price book from a products DataFrame.
+        :param df: DataFrame with product_id, product_price and (optionally) product_member_price columns.
+        :return: The PriceBook.
+        """
+        member_prices = df['product_member_price'] if 'product_member_price' in df.columns else None
+        return cls(df['product_id'].to_numpy(), df['product_price'].to_numpy(), member_prices)
+
+    def index_of(self, product_ids) -> np.ndarray:
+        """
+        Find the positions of products in the price book.
+        :param product_ids: A sequence of product ids.
+        :return: An array of positions.
+        """
+        ids = np.asarray(product_ids, dtype=np.int64)
+        if ids.size == 0:
+            return np.zeros(0, dtype=np.int64)
+        positions = np.searchsorted(self._ids, ids)
+        positions = np.minimum(positions, max(len(self._ids) - 1, 0))
+        if len(self._ids) == 0 or (self._ids[positions] != ids).any():
+            missing = ids if len(self._ids) == 0 else ids[self._ids[positions] != ids]
+            raise KeyError(f'Unknown product id {missing[0]}.')
+        return positions
+
+    def priced(self, product_ids) -> np.ndarray:
+        """
+        Check which products have a retail price and can be sold.
+        :param product_ids: A sequence of product ids.
+        :return: A bool array.
+        """
+        return self._price_cents[self.index_of(product_ids)] >= 0
+
+    def unit_prices(self, product_ids, members) -> np.ndarray:
+        """
+        Get the unit price in cents for each product.
+        :param product_ids: A sequence of product ids.
+        :param members: A bool, or a bool per product id, selecting the member price.
+        :return: An int64 array of cents.
+        :raises ValueError: If a product has no retail price.
+        """
+        positions = self.index_of(product_ids)
+        unpriced = self._price_cents[positions] < 0
+        if unpriced.any():
+            raise ValueError(f'Product {self._ids[positions[unpriced][0]]} has no price and cannot be sold.')
+        return np.where(np.asarray(members, dtype=bool), self._member_cents[positions], self._price_cents[positions])
+
+    def quote(self, items: List[Tuple[Any, int]], member: bool = False) -> Dict[str, Any]:
+        """
+        Price a cart.
+        :param items: The cart items as (Product, quantity) tuples. Repeated products are combined.
+        :param member: Whether the customer is a member.
+        :return: A dict with 'lines' (product, quantity, unit_cents and total_cents per product)
+                 and the order 'total_cents'.
+        """
+        products = {}
+        quantities = {}
+        for product, quantity in items:
+            products.setdefault(product.id, product)
+            quantities[product.id] = quantities.get(product.id, 0) + quantity
+        if not products:
+            return {'lines': [], 'total_cents': 0}
+
+        counts = np.fromiter(quantities.values(), dtype=np.int64, count=len(quantities))
+        units = self.unit_prices(list(quantities.keys()), member)
+        totals = units * counts
+        lines = [{'product': products[product_id], 'quantity': int(count),
+                  'unit_cents': int(unit), 'total_cents': int(total)}
+                 for product_id, count, unit, total in zip(quantities, counts, units, totals)]
+        return {'lines': lines, 'total_cents': int(totals.sum())}
+
+    def quote_many(self, cart_ids, product_ids, quantities, members) -> np.ndarray:
+        """
+        Price many carts at once, example: for a promotion run or reconciliation.
+        The carts are given as flat line arrays: line i puts quantities[i] of product_ids[i] in cart cart_ids[i].
+        :param cart_ids: The cart number (0 .. n_carts - 1) of each line.
+        :param product_ids: The product id of each line.
+        :param quantities: The quantity of each line.
+        :param members: A bool per cart selecting member prices.
+        :return: An int64 array with the total in cents of each cart.
+        """
+        cart_ids = np.asarray(cart_ids, dtype=np.int64)
+        members = np.asarray(members, dtype=bool)
+        line_totals = self.unit_prices(product_ids, members[cart_ids]) * np.asarray(quantities, dtype=np.int64)
+        totals = np.zeros(len(members), dtype=np.int64)
+        np.add.at(totals, cart_ids, line_totals)
+        return totals
@@ -0,0 +1,128 @@
+import heapq
+import threading
+from typing import Dict, List, Tuple
+
+# Reorder point for products without a product_reorder_point column value.
+DEFAULT_REORDER_POINT = 5
+
+
+class RestockMonitor(object):
+    """
+    Products in a min-heap keyed by stock above their reorder point (quantity - reorder_point), updated
+    on every stock change, so 'lowest stock' and 'below reorder point' queries only touch the heap top.
+    Stale heap entries are skipped lazily and the heap is rebuilt once they outnumber live ones.
+    """
+
+    def __init__(self, default_reorder_point: int = DEFAULT_REORDER_POINT) -> None:
+        """
+        The __init__ method for RestockMonitor.
+        :param default_reorder_point: (Optional) Reorder point of products that do not specify one.
+        """
+        self.default_reorder_point = default_reorder_point
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[int, int, int]] = []  # (quantity - reorder_point, version, product_id)
+        self._current: Dict[int, Tuple[int, int, int]] = {}  # product_id -> (quantity, reorder_point, version)
+        self._version = 0
+
+    @classmethod
+    def from_dataframe(cls, df, default_reorder_point: int = DEFAULT_REORDER_POINT) -> 'RestockMonitor':
+        """
+        Build the monitor from a products DataFrame. Rows without a usable quantity are skipped.
+        :param df: DataFrame with product_id, product_quantity and optionally product_reorder_point columns.
+        :param default_reorder_point: (Optional) Reorder point of products that do not specify one.
+        :return: The RestockMonitor.
+        """
+        monitor = cls(default_reorder_point)
+        ids = df['product_id'].tolist()
+        quantities = df['product_quantity'].tolist()
+        if 'product_reorder_point' in df.columns:
+            points = df['product_reorder_point'].tolist()
+        else:
+            points = [None] * len(ids)
+        for product_id, quantity, point in zip(ids, quantities, points):
+            try:
+                product_id, quantity = int(product_id), int(float(quantity))
+            except (TypeError, ValueError, OverflowError):
+                continue  # No usable quantity (e.g. left blank when the product was added), nothing to monitor.
+            monitor._heap.append(monitor._set(product_id, quantity, monitor._reorder_point(point)))
+        heapq.heapify(monitor._heap)
+        return monitor
+
+    def __len__(self) -> int:
+        return len(self._current)
+
+    def update(self, product_id: int, quantity: int, reorder_point: int | None = None) -> None:
+        """
+        Record a product's new stock level, example: after a sale or a restock.
+        :param product_id: The product id.
+        :param quantity: The new quantity in stock.
+        :param reorder_point: (Optional) A new reorder point, defaults to the product's current one.
+        :return: None
+        """
+        with self._lock:
+            product_id = int(product_id)
+            if reorder_point is None:
+                current = self._current.get(product_id)
+                reorder_point = current[1] if current else self.default_reorder_point
+            else:
+                reorder_point = self._reorder_point(reorder_point)
+            entry = self._set(product_id, int(quantity), reorder_point)
+            heapq.heappush(self._heap, entry)
+            if len(self._heap) > 2 * len(self._current) + 64:
+                self._rebuild()
+
+    def remove(self, product_id: int) -> None:
+        """
+        Stop monitoring a product, example: after it was deleted.
+        :param product_id: The product id.
+        :return: None
+        """
+        with self._lock:
+            self._current.pop(int(product_id), None)
+
+    def lowest(self, n: int) -> List[Tuple[int, int, int]]:
+        """
+        Get the n products with the least stock above their reorder point.
+        :param n: The number of products.
+        :return: A list of (product_id, quantity, reorder_point), lowest first.
+        """
+        with self._lock:
+            return self._take(lambda key, count: count < n)
+
+    def below_threshold(self) -> List[Tuple[int, int, int]]:
+        """
+        Get every product at or below its reorder point.
+        :return: A list of (product_id, quantity, reorder_point), lowest first.
+        """
+        with self._lock:
+            return self._take(lambda key, count: key <= 0)
+
+    def _take(self, wanted) -> List[Tuple[int, int, int]]:
+        """Pop live entries from the top of the heap while wanted(key, count) holds, then push them back."""
+        taken = []
+        while self._heap and wanted(self._heap[0][0], len(taken)):
+            key, version, product_id = heapq.heappop(self._heap)
+            current = self._current.get(product_id)
+            if current is not None and current[2] == version:
+                taken.append((key, version, product_id))
+        for entry in taken:
+            heapq.heappush(self._heap, entry)
+        return [(product_id, self._current[product_id][0], self._current[product_id][1])
+                for _, _, product_id in taken]
+
+    def _set(self, product_id: int, quantity: int, reorder_point: int) -> Tuple[int, int, int]:
+        self._version += 1
+        self._current[product_id] = (quantity, reorder_point, self._version)
+        return quantity - reorder_point, self._version, product_id
+
+    def _rebuild(self) -> None:
+        self._heap = [(quantity - point, version, product_id)
+                      for product_id, (quantity, point, version) in self._current.items()]
+        heapq.heapify(self._heap)
+
+    def _reorder_point(self, value) -> int:
+        try:
+            point = int(value)
+        except (TypeError, ValueError):
+            return self.default_reorder_point
+        return point
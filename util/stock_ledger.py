@@ -0,0 +1,260 @@
+import contextlib
+import json
+import os
+import threading
+from typing import Callable, Dict, Iterator
+
+from util.catalog_snapshot import read_products, write_products
+from util.file_lock import FileLock
+from util.instrumentation import measure
+from util.lazy_pandas import load_pandas
+from util.order_journal import OrderJournal
+
+# The journalled sales are folded back into products.csv after this many orders.
+COMPACT_EVERY = 200
+
+
+class OutOfStockError(ValueError):
+    """Raised when an order takes more of a product than is left in stock."""
+
+
+class StockLedger(object):
+    """
+    Product stock as the 'product_quantity' column of products.csv less the orders journalled since products.csv
+    was last compacted. A checkout only appends to the order journal instead of rewriting products.csv;
+    compact() folds the new orders into products.csv with one read-modify-write, which happens automatically
+    every compact_every orders. Compaction and every other rewrite of products.csv (see editing()) hold the
+    same file lock, so admin edits, sales and other processes never overwrite each other; load() only holds
+    it shared, so readers do not wait for each other.
+    """
+
+    _ledgers: Dict[str, 'StockLedger'] = {}
+    _ledgers_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, products_file) -> 'StockLedger':
+        """
+        Get the stock ledger for a products.csv file, shared by everyone in this process.
+        :param products_file: Path to products.csv. The order journal is orders.jsonl next to it.
+        :return: The StockLedger.
+        """
+        key = os.path.abspath(products_file)
+        with cls._ledgers_lock:
+            ledger = cls._ledgers.get(key)
+            if ledger is None:
+                ledger = cls._ledgers[key] = cls(products_file)
+            return ledger
+
+    def __init__(self, products_file, compact_every: int = COMPACT_EVERY) -> None:
+        """
+        The __init__ method for StockLedger. Prefer StockLedger.open() so that everyone shares one journal position.
+        :param products_file: Path to products.csv.
+        :param compact_every: (Optional) Number of journalled orders after which products.csv is compacted.
+        """
+        self.products_file = os.fspath(products_file)
+        data_path = os.path.dirname(self.products_file)
+        self.compact_every = compact_every
+        self.journal = OrderJournal.open(os.path.join(data_path, 'orders.jsonl'))
+        self._checkpoint_filename = os.path.join(data_path, 'stock_ledger.checkpoint.json')
+        self._file_lock = FileLock.open(self.products_file + '.lock')
+        self._lock = threading.RLock()
+        self._applied_offset = None  # Journal bytes already included in products.csv, known after _catch_up().
+        self._read_offset = 0  # Journal bytes already read into _decrements.
+        self._decrements: Dict[int, int] = {}  # Quantity sold per product_id since _applied_offset.
+        self._orders = 0  # Orders read since _applied_offset.
+        self._quantities: Dict[int, int] = {}  # product_id -> quantity in products.csv, see _csv_quantities().
+        self._quantities_version = None
+
+    def load(self):
+        """
+        Load the product table with current stock: products.csv less the orders journalled since its last compaction.
+        :return: The product DataFrame.
+        """
+        with self.reading() as decrements:
+            df = read_products(self.products_file)
+        return self._subtract(df, decrements)
+
+    @contextlib.contextmanager
+    def reading(self) -> Iterator[Dict[int, int]]:
+        """
+        Hold the products.csv lock shared, so that products.csv is not compacted or edited meanwhile, example:
+        with stock.reading() as decrements: df = read_products(path); <stock is quantity less decrements>.
+        :return: A context manager giving the quantity sold per product_id since products.csv was last compacted.
+        """
+        # Readers only need the checkpoint and products.csv to match, so they share the lock; the exclusive lock
+        # is only needed on first use and to finish an interrupted compaction, which both write.
+        with self._file_lock.shared():
+            checkpoint = self._read_checkpoint()
+            if checkpoint is not None and checkpoint['pending'] is None:
+                with self._lock:
+                    self._follow(checkpoint)
+                    decrements = dict(self._decrements)
+                yield decrements
+                return
+        with self._file_lock:
+            with self._lock:
+                self._catch_up()
+                decrements = dict(self._decrements)
+            yield decrements
+
+    def compact(self) -> int:
+        """
+        Fold the orders journalled since the last compaction into products.csv with one rewrite.
+        Safe against crashes: the quantities to write are checkpointed first and re-applied on the next use.
+        :return: The number of products whose sales were folded in.
+        """
+        return len(self._compact(1))
+
+    def compact_if_due(self) -> int:
+        """
+        Compact once compact_every orders have been journalled since the last compaction.
+        Checkouts only hold the in-memory lock for as long as it takes to read the new journal lines.
+        :return: The number of products whose sales were folded in.
+        """
+        if self._applied_offset is None:
+            with self._file_lock, self._lock:
+                self._catch_up()
+        with self._lock:
+            self._read_new_orders()
+            if self._orders < self.compact_every:
+                return 0
+        return len(self._compact(self.compact_every))
+
+    @contextlib.contextmanager
+    def editing(self):
+        """
+        Hold the products.csv lock for a read-modify-write, example:
+        with stock.editing(): df = read_products(path); <change df>; write_products(df, path).
+        Journalled sales are compacted first, so that the quantities read are current.
+        :return: A context manager giving the quantity sold per product_id that was folded into products.csv.
+        """
+        with self._file_lock:
+            yield self._compact(1)
+
+    @contextlib.contextmanager
+    def selling(self) -> Iterator[Callable[[int], int]]:
+        """
+        Hold the products.csv lock while orders are checked against current stock and journalled, so that no other
+        store, in this process or another, sells the same stock in between, example:
+        with stock.selling() as available: <reject orders above available(product_id)>; journal.append_many(...).
+        :return: A context manager giving a function from product_id to the quantity currently in stock.
+        """
+        with self._file_lock:
+            with self._lock:
+                self._catch_up()
+                decrements = dict(self._decrements)
+            quantities = self._csv_quantities()
+            yield lambda product_id: quantities.get(product_id, 0) - decrements.get(product_id, 0)
+
+    def _compact(self, min_orders: int) -> Dict[int, int]:
+        # Lock order: the file lock, then the in-memory lock, which is only held to read and update the journal
+        # position so that checkouts are not kept waiting while products.csv is rewritten.
+        with self._file_lock:
+            with self._lock:
+                self._catch_up()
+                if self._orders < min_orders:
+                    return {}
+                offset, decrements, orders = self._read_offset, dict(self._decrements), self._orders
+            with measure('StockLedger.compact'):
+                df = self._subtract(read_products(self.products_file), decrements)
+                sold = df[df['product_id'].isin(list(decrements))]
+                pending = dict(zip(sold['product_id'].astype(str).tolist(), sold['product_quantity'].tolist()))
+                checkpoint = {'applied_offset': offset, 'pending': pending}
+                self._write_checkpoint(checkpoint)
+
+                write_products(df, self.products_file)
+                checkpoint['pending'] = None
+                self._write_checkpoint(checkpoint)
+            with self._lock:
+                # Orders read by checkouts while products.csv was written stay pending.
+                self._applied_offset = offset
+                for product_id, quantity in decrements.items():
+                    self._decrements[product_id] -= quantity
+                    if not self._decrements[product_id]:
+                        del self._decrements[product_id]
+                self._orders -= orders
+            return decrements
+
+    def version(self) -> tuple:
+        """
+        Identify the current stock levels without reading them.
+        :return: A tuple that changes whenever products.csv or the order journal changes.
+        """
+        version = []
+        for path in (self.products_file, self.journal.path):
+            try:
+                stat = os.stat(path)
+                version.extend([stat.st_size, stat.st_mtime_ns])
+            except FileNotFoundError:
+                version.extend([None, None])
+        return tuple(version)
+
+    def _catch_up(self) -> None:
+        """Finish an interrupted compaction and follow compactions by other processes. Called with both locks held."""
+        checkpoint = self._read_checkpoint()
+        if checkpoint is None:
+            # First use: products.csv was saved after every checkout until now, so it includes the whole journal.
+            checkpoint = {'applied_offset': self.journal.read_from(0)[1], 'pending': None}
+            self._write_checkpoint(checkpoint)
+        elif checkpoint['pending'] is not None:
+            df = read_products(self.products_file)
+            quantities = {int(product_id): quantity for product_id, quantity in checkpoint['pending'].items()}
+            sold = df['product_id'].isin(list(quantities))
+            df.loc[sold, 'product_quantity'] = df.loc[sold, 'product_id'].map(quantities)
+            write_products(df, self.products_file)
+            checkpoint['pending'] = None
+            self._write_checkpoint(checkpoint)
+        self._follow(checkpoint)
+
+    def _follow(self, checkpoint: Dict) -> None:
+        """Follow a compaction recorded in the checkpoint and read the orders journalled since. Needs _lock."""
+        if checkpoint['applied_offset'] != self._applied_offset:
+            self._reset(checkpoint['applied_offset'])
+        self._read_new_orders()
+
+    def _read_new_orders(self) -> None:
+        records, self._read_offset = self.journal.read_from(self._read_offset)
+        for record in records:
+            for line in record['lines']:
+                self._decrements[line['product_id']] = self._decrements.get(line['product_id'], 0) + line['quantity']
+        self._orders += len(records)
+
+    def _reset(self, applied_offset: int) -> None:
+        self._applied_offset = self._read_offset = applied_offset
+        self._decrements = {}
+        self._orders = 0
+
+    def _csv_quantities(self) -> Dict[int, int]:
+        """The quantities in products.csv, re-read only when it changes. Called with the file lock held."""
+        stat = os.stat(self.products_file)
+        if self._quantities_version != (stat.st_size, stat.st_mtime_ns):
+            pd = load_pandas()
+            df = read_products(self.products_file)
+            quantity = pd.to_numeric(df['product_quantity'], errors='coerce')
+            usable = quantity.notna()  # Products without a usable quantity cannot be sold.
+            self._quantities = dict(zip(df.loc[usable, 'product_id'].astype('int64').tolist(),
+                                        quantity[usable].astype('int64').tolist()))
+            self._quantities_version = (stat.st_size, stat.st_mtime_ns)
+        return self._quantities
+
+    @staticmethod
+    def _subtract(df, decrements: Dict[int, int]):
+        if decrements:
+            sold = df['product_id'].map(decrements).fillna(0).astype('int64')
+            df['product_quantity'] = df['product_quantity'] - sold
+        return df
+
+    def _read_checkpoint(self) -> Dict | None:
+        try:
+            with open(self._checkpoint_filename, mode='r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _write_checkpoint(self, checkpoint: Dict) -> None:
+        temp_filename = self._checkpoint_filename + '.tmp'
+        with open(temp_filename, mode='w') as file:
+            json.dump(checkpoint, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_filename, self._checkpoint_filename)